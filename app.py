@@ -1,43 +1,81 @@
-from flask import Flask, render_template_string, Response
+import time
+
+# 在匯入 Flask 之前開始計時，Flask 本身的匯入約占啟動時間的九成以上；
+# 直譯器本身的啟動時間量不到，完整的「程序啟動到第一個回應」請用 python bench.py run
+_startup_t0 = time.perf_counter()
+
+from flask import Flask, render_template_string, Response, request, jsonify, stream_with_context
 import json
 import os
 import logging
 import csv
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
 
+from catalogue import load_catalogue
+from corpus import COMPILED_DIR
+
 app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
 
-BOOKS_JSON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'books.json')
-try:
-    with open(BOOKS_JSON_PATH, 'r', encoding='utf-8') as f:
-        books_data = json.load(f)
-    app.logger.info(f"成功讀取 books.json: {BOOKS_JSON_PATH}")
-except Exception as e:
-    app.logger.error(f"讀取 books.json 發生錯誤: {e}")
-    books_data = {}
-
-book_list = {}
-for docx, inner in books_data.items():
-    app.logger.info(f"處理檔案: {docx}")
-    for code, values in inner.items():
-        if isinstance(values, list) and len(values) >= 2:
-            book_list[code] = values[1]
-
-formatted_books = []
-for code, title in sorted(book_list.items()):
-    formatted_books.append(f"({code}) {title}")
+# 目錄資料優先取自 compiled/catalogue.json 快照，books.json 變更時自動重建
+catalogue = load_catalogue()
+book_list = catalogue["book_list"]
+formatted_books = catalogue["formatted_books"]
 app.logger.info(f"總共 {len(formatted_books)} 個選項")
 
+# 首頁的來源分面選單：(來源檔名, 顯示名稱, 書本數)
+collection_choices = [
+    (name, os.path.splitext(name)[0], bin(bits).count("1"))
+    for name, bits in catalogue["facets"]["collection"].items()
+]
+
+HTML_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "html")
+# build_data.py 預先壓縮的結果檔
+HTML_GZ_DIR = os.path.join(COMPILED_DIR, "html_gz")
+
+# /api/results 的限制：單次請求的書本數上限與並行讀取的執行緒數
+MAX_BATCH_CODES = int(os.environ.get("MAX_BATCH_CODES", "50"))
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", "8"))
+
+# 首頁以外才需要的資料延後到第一次使用時才建立
+_books_csv = None
+_html_index = None
+_batch_executor = None
+_density = None
+_term_index = None
+_sqlite_path = None
+
+# /api/sql 是否允許任意（唯讀）SQL；預設只開放預先定義的查詢
+SQL_API_ALLOW_RAW = os.environ.get("SQL_API_ALLOW_RAW", "") == "1"
+
+def get_books_csv():
+    global _books_csv
+    if _books_csv is None:
+        si = StringIO()
+        writer = csv.writer(si)
+        writer.writerow(["Code", "Title"])
+        for code, title in sorted(book_list.items()):
+            writer.writerow([code, title])
+        _books_csv = si.getvalue()
+        si.close()
+    return _books_csv
+
+def preload_data():
+    """
+    一次建立所有延遲初始化的資料。正式環境（serve.py）在 fork 前呼叫，
+    讓各 worker 以 copy-on-write 共用同一份唯讀結構。
+    """
+    get_books_csv()
+    get_html_index()
+    get_density()
+    get_term_index()
+    get_sqlite_path()
+    app.logger.info("已預先載入所有資料")
+
 @app.route("/download_csv")
 def download_csv():
-    si = StringIO()
-    writer = csv.writer(si)
-    writer.writerow(["Code", "Title"])
-    for code, title in sorted(book_list.items()):
-        writer.writerow([code, title])
-    output = si.getvalue()
-    si.close()
+    output = get_books_csv()
     app.logger.info("下載 CSV 檔案")
     return Response(
         output,
@@ -45,19 +83,280 @@ def download_csv():
         headers={"Content-Disposition": "attachment;filename=books.csv"}
     )
 
+def get_html_index(refresh=False):
+    """
+    html 目錄的檔名索引（小寫檔名 → 實際檔名），第一次使用時才掃描目錄。
+    """
+    global _html_index
+    if _html_index is None or refresh:
+        _html_index = {file.lower(): file for file in os.listdir(HTML_DIR)}
+    return _html_index
+
+def find_result_file(code):
+    """
+    依代碼找出 html 目錄中對應的檔案（不論大小寫），找不到時傳回 None。
+    索引中沒有時會重新掃描一次，以便看到執行期間新增的檔案。
+    """
+    target = code.lower() + ".html"
+    file = get_html_index().get(target)
+    if file is None:
+        file = get_html_index(refresh=True).get(target)
+    if file is None:
+        return None
+    return os.path.join(HTML_DIR, file)
+
+def read_result(code):
+    filename = find_result_file(code)
+    if filename is None:
+        return None
+    with open(filename, "r", encoding="utf-8") as f:
+        return f.read()
+
+def split_param(name):
+    return [value.strip() for value in request.args.get(name, "").split(",") if value.strip()]
+
+def read_result_gzip(code):
+    """
+    預先壓縮的結果檔內容；沒有壓縮檔或壓縮檔比原始檔舊時傳回 None。
+    """
+    filename = find_result_file(code)
+    if filename is None:
+        return None
+    gz_path = os.path.join(HTML_GZ_DIR, os.path.basename(filename) + ".gz")
+    try:
+        if os.path.getmtime(gz_path) < os.path.getmtime(filename):
+            return None
+        with open(gz_path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def parse_batch_codes(value):
+    """
+    解析逗號分隔的代碼並去除重複，傳回 (代碼列表, 錯誤訊息)；asgi.py 亦共用。
+    """
+    codes = []
+    for code in value.split(","):
+        code = code.strip()
+        if code and code not in codes:
+            codes.append(code)
+    if not codes:
+        return [], "請提供 codes 參數"
+    if len(codes) > MAX_BATCH_CODES:
+        return [], f"一次最多 {MAX_BATCH_CODES} 本，收到 {len(codes)} 本"
+    return codes, None
+
+def get_batch_executor():
+    # 在 worker 內第一次使用時才建立，避免執行緒池跨 fork 帶到子程序
+    global _batch_executor
+    if _batch_executor is None:
+        _batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch")
+    return _batch_executor
+
 @app.route("/get_result/<code>")
 def get_result(code):
-    html_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "html")
     target = code.lower() + ".html"
-    for file in os.listdir(html_dir):
-        if file.lower() == target:
-            filename = os.path.join(html_dir, file)
-            with open(filename, "r", encoding="utf-8") as f:
-                content = f.read()
-            app.logger.info(f"成功讀取 {filename}")
-            return content
-    app.logger.error(f"找不到檔案 {target}")
-    return f"<p>找不到結果檔案: {target}</p>"
+    # "gzip;q=0" 表示客戶端拒絕 gzip，須看品質值而不是只看有沒有出現
+    if request.accept_encodings["gzip"] > 0:
+        packed = read_result_gzip(code)
+        if packed is not None:
+            app.logger.info(f"成功讀取 {target}（gzip）")
+            resp = Response(packed, mimetype="text/html")
+            resp.headers["Content-Encoding"] = "gzip"
+            resp.vary.add("Accept-Encoding")
+            return resp
+    content = read_result(code)
+    if content is None:
+        app.logger.error(f"找不到檔案 {target}")
+        return f"<p>找不到結果檔案: {target}</p>"
+    app.logger.info(f"成功讀取 {target}")
+    return content
+
+@app.route("/api/results")
+def api_results():
+    """
+    一次取得多本書的結果：/api/results?codes=T0848,T0849
+    預設傳回單一 JSON；format=ndjson 時逐本串流，每行一個 JSON 物件，前端可邊收邊顯示。
+    """
+    codes, error = parse_batch_codes(request.args.get("codes", ""))
+    if error:
+        return jsonify({"error": error}), 400
+
+    # executor.map 依請求順序傳回，同時最多 BATCH_WORKERS 個檔案並行讀取
+    results = get_batch_executor().map(read_result, codes)
+    app.logger.info(f"批次讀取 {len(codes)} 本: {','.join(codes)}")
+
+    if request.args.get("format") == "ndjson":
+        def generate():
+            for code, content in zip(codes, results):
+                yield json.dumps({"code": code, "found": content is not None, "html": content},
+                                 ensure_ascii=False) + "\n"
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    payload = {"results": [], "missing": []}
+    for code, content in zip(codes, results):
+        if content is None:
+            payload["missing"].append(code)
+        else:
+            payload["results"].append({"code": code, "html": content})
+    return jsonify(payload)
+
+def get_density():
+    # numpy 與密度陣列只在第一次需要時才載入，不拖慢冷啟動
+    global _density
+    if _density is None:
+        import density
+        _density = density.load_density()
+    return _density
+
+@app.route("/api/density")
+def api_density():
+    """
+    書×卷 的名相命中密度，供繪製熱度圖：
+    /api/density?codes=T0848&by=total|category|group&groups=曼荼羅,真言&format=json|npz
+    省略 codes 時傳回全部書（by=group 則必須指定 codes 或 groups）；
+    format=npz 傳回壓縮的 numpy .npz（data、codes、labels、juan_counts）。
+    """
+    import density
+    data = get_density()
+    codes = split_param("codes")
+    by = request.args.get("by", "total")
+    try:
+        matrix, labels, rows = density.select(data, codes, by, split_param("groups"))
+    except KeyError as e:
+        return jsonify({"error": "找不到代碼或群組", "unknown": e.args[0]}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    codes = data["codes"][rows].tolist()
+    if request.args.get("format") == "npz":
+        return Response(
+            density.to_npz_bytes(matrix, codes, labels, data["juan_counts"][rows]),
+            mimetype="application/octet-stream",
+            headers={
+                "Content-Disposition": f"attachment;filename=density_{by}.npz",
+                "X-Density-Shape": ",".join(str(n) for n in matrix.shape),
+            }
+        )
+    return jsonify({
+        "codes": codes,
+        "by": by,
+        "labels": labels,
+        "juans": matrix.shape[1],
+        "juan_counts": data["juan_counts"][rows].tolist(),
+        "data": matrix.tolist(),
+    })
+
+@app.route("/export")
+def export():
+    """
+    串流匯出多本書的名相資料：/export?format=zip|ndjson&codes=T0848,T0849
+    zip 為每本一個 CSV；ndjson 為 gzip 壓縮、每行一個名相。省略 codes 時匯出全部。
+    壓縮檔邊產生邊傳送，不會整個放在記憶體中。
+    """
+    import export as exporter
+    fmt = request.args.get("format", "zip")
+    if fmt not in exporter.EXPORT_FORMATS:
+        return jsonify({"error": f"未知的格式: {fmt}"}), 400
+    codes, missing = exporter.resolve_codes(split_param("codes"))
+    if missing:
+        return jsonify({"error": "找不到代碼", "unknown": missing}), 404
+
+    generate, mimetype, filename = exporter.EXPORT_FORMATS[fmt]
+    app.logger.info(f"匯出 {len(codes)} 本書 ({fmt})")
+    return Response(
+        stream_with_context(generate(codes)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment;filename={filename}"}
+    )
+
+def get_term_index():
+    # 「有命中」分面需要掃描 words6_json，延後到第一次查詢時才載入
+    global _term_index
+    if _term_index is None:
+        import facets
+        _term_index = facets.load_term_index([book["code"] for book in catalogue["books"]])
+    return _term_index
+
+def int_param(name):
+    value = request.args.get(name, "").strip()
+    return int(value) if value else None
+
+@app.route("/api/books")
+def api_books():
+    """
+    分面瀏覽目錄：/api/books?q=毘盧&collection=...&juan_min=2&juan_max=7&term=曼荼羅&group=...
+    各條件以預先計算的位元集合做位元運算，結果附上各分面的計數。
+    """
+    import facets
+    try:
+        juan_min = int_param("juan_min")
+        juan_max = int_param("juan_max")
+    except ValueError:
+        return jsonify({"error": "juan_min / juan_max 必須是整數"}), 400
+    term = request.args.get("term", "").strip()
+    group = request.args.get("group", "").strip()
+    bits, counts = facets.search(
+        catalogue,
+        get_term_index() if term or group else None,
+        q=request.args.get("q", "").strip(),
+        collection=request.args.get("collection", "").strip(),
+        juan_min=juan_min,
+        juan_max=juan_max,
+        term=term,
+        group=group,
+    )
+    books = catalogue["books"]
+    return jsonify({
+        "total": facets.popcount(bits),
+        "results": [books[i] for i in facets.iter_bits(bits)],
+        "facets": {
+            "collection": counts["collection"],
+            "juans": {str(juans): count for juans, count in counts["juans"].items()},
+        },
+    })
+
+def get_sqlite_path():
+    # 資料庫不存在或過期時才建立，之後每個請求各自開唯讀連線
+    global _sqlite_path
+    if _sqlite_path is None:
+        import sqlite_db
+        _sqlite_path = sqlite_db.ensure_database()
+    return _sqlite_path
+
+@app.route("/api/sql")
+@app.route("/api/sql/<name>")
+def api_sql(name=None):
+    """
+    SQLite 查詢：/api/sql/<name>?參數=值 執行預先定義的查詢；/api/sql 列出所有預先定義的查詢。
+    設定 SQL_API_ALLOW_RAW=1 時，/api/sql?q=SELECT ... 可執行任意唯讀 SQL。
+    """
+    import sqlite3
+    import sqlite_db
+    raw_sql = request.args.get("q", "").strip()
+    if name is None and not raw_sql:
+        return jsonify({
+            query_name: {"description": description, "params": defaults}
+            for query_name, (description, _, defaults) in sqlite_db.SAVED_QUERIES.items()
+        })
+    try:
+        if name is None:
+            if not SQL_API_ALLOW_RAW:
+                return jsonify({"error": "未開放任意 SQL，請使用預先定義的查詢"}), 403
+            result = sqlite_db.run_query(raw_sql, path=get_sqlite_path())
+        else:
+            if name not in sqlite_db.SAVED_QUERIES:
+                return jsonify({"error": f"找不到查詢: {name}"}), 404
+            params = sqlite_db.saved_query_params(name, request.args)
+            result = sqlite_db.run_query(sqlite_db.SAVED_QUERIES[name][1], params, path=get_sqlite_path())
+    except KeyError as e:
+        return jsonify({"error": f"缺少參數: {e.args[0]}"}), 400
+    except ValueError as e:
+        return jsonify({"error": f"參數格式錯誤: {e}"}), 400
+    except sqlite3.Error as e:
+        return jsonify({"error": f"查詢失敗: {e}"}), 400
+    app.logger.info(f"SQL 查詢 {name or raw_sql[:80]}: {len(result['rows'])} 列，{result['seconds'] * 1000:.1f} ms")
+    return jsonify(result)
 
 template = '''
 <!DOCTYPE html>
@@ -132,6 +431,21 @@ template = '''
         #resultContainer {
             margin-top: 20px;
         }
+        .facet-group {
+            display: flex;
+            flex-wrap: wrap;
+            align-items: center;
+            gap: 12px;
+            margin-bottom: 20px;
+            font-size: 20px;
+        }
+        .facet-group select, .facet-group input {
+            font-size: 20px;
+            padding: 4px;
+        }
+        .facet-group input[type=number] {
+            width: 5em;
+        }
     </style>
     <script>
         var options = {{ options|tojson }};
@@ -256,6 +570,48 @@ template = '''
             });
         }
         
+        // 依分面條件向 /api/books 取得符合的書，更新下拉選單的選項與各分面計數
+        function applyFacets() {
+            var params = new URLSearchParams();
+            var fields = {
+                collection: "collectionFacet",
+                juan_min: "juanMinFacet",
+                juan_max: "juanMaxFacet",
+                term: "termFacet"
+            };
+            for (var key in fields) {
+                var value = document.getElementById(fields[key]).value.trim();
+                if (value !== "") {
+                    params.append(key, value);
+                }
+            }
+            fetch("/api/books?" + params.toString())
+            .then(function(response) { return response.json(); })
+            .then(function(data) {
+                if (data.error) {
+                    document.getElementById("facetCount").textContent = data.error;
+                    return;
+                }
+                options = data.results.map(function(book) {
+                    return "(" + book.code + ") " + book.title;
+                });
+                var select = document.getElementById("collectionFacet");
+                for (var i = 0; i < select.options.length; i++) {
+                    var opt = select.options[i];
+                    if (opt.value !== "") {
+                        opt.textContent = opt.dataset.label + " (" + (data.facets.collection[opt.value] || 0) + ")";
+                    }
+                }
+                document.getElementById("facetCount").textContent = "符合 " + data.total + " 本";
+                if (document.getElementById("dropdown").style.display === "block") {
+                    filterOptions();
+                }
+            })
+            .catch(function(error) {
+                document.getElementById("facetCount").textContent = "篩選失敗: " + error;
+            });
+        }
+        
         function clearInput() {
             document.getElementById("searchInput").value = "";
             document.getElementById("dropdown").style.display = "none";
@@ -317,6 +673,17 @@ template = '''
             <div id="dropdown"></div>
         </div>
     </div>
+    <div class="facet-group">
+        <select id="collectionFacet" onchange="applyFacets()">
+            <option value="">全部來源</option>
+            {% for name, label, count in collections %}
+            <option value="{{ name }}" data-label="{{ label }}">{{ label }} ({{ count }})</option>
+            {% endfor %}
+        </select>
+        <label>卷數 <input type="number" id="juanMinFacet" min="0" onchange="applyFacets()"> ～ <input type="number" id="juanMaxFacet" min="0" onchange="applyFacets()"></label>
+        <label>含名相 <input type="text" id="termFacet" onchange="applyFacets()" placeholder="例如：曼荼羅"></label>
+        <span id="facetCount">共 {{ options|length }} 本</span>
+    </div>
     <div class="button-group">
         <button id="clearButton" onclick="clearInput()">清除</button>
         <button id="downloadCSVButton" onclick="downloadCSV()">下載 CSV 檔</button>
@@ -330,7 +697,9 @@ template = '''
 @app.route("/")
 def index():
     app.logger.info("進入首頁")
-    return render_template_string(template, options=formatted_books)
+    return render_template_string(template, options=formatted_books, collections=collection_choices)
+
+app.logger.info(f"啟動完成，匯入 app（含 Flask）耗時 {(time.perf_counter() - _startup_t0) * 1000:.1f} ms")
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", debug=True)
@@ -0,0 +1,265 @@
+"""
+ASGI 服務入口：/get_result 與 /api/results 在事件迴圈上處理，檔案讀取移到執行緒中執行；
+同一本書同時有多個請求未命中快取時只讀取一次，所有等待者共用結果。
+其餘路由交給原本的 Flask app（經 asgiref 轉接）。
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 4
+    python asgi.py            # 同上，參數取自 WEB_BIND / WEB_WORKERS
+
+環境變數 RESULT_CACHE_BYTES 設定結果快取的上限（預設 64 MB）。
+"""
+import asyncio
+import json
+import os
+import sys
+from collections import OrderedDict
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+import app as app_module
+
+RESULT_CACHE_BYTES = int(os.environ.get("RESULT_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+logger = app_module.app.logger
+
+
+class SingleFlight:
+    """
+    合併同一個鍵的並行載入：第一個請求在執行緒中執行載入，之後到達的請求等待同一個結果。
+    個別等待者取消（例如客戶端斷線）不會中斷載入本身。
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def do(self, key, func, *args):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(asyncio.to_thread(func, *args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+
+class ResultCache:
+    """
+    以位元組數為上限的 LRU 快取，只在事件迴圈執行緒中使用，不需要鎖。
+    每筆資料附帶來源檔案的修改時間（stamp），由呼叫端判斷是否過期。
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._size = 0
+
+    def get(self, key):
+        """
+        傳回 (stamp, data)；沒有時傳回 None。
+        """
+        entry = self._items.get(key)
+        if entry is not None:
+            self._items.move_to_end(key)
+        return entry
+
+    def put(self, key, stamp, data):
+        if len(data) > self.max_bytes:
+            return
+        self.discard(key)
+        self._items[key] = (stamp, data)
+        self._size += len(data)
+        while self._size > self.max_bytes:
+            _, (_, evicted) = self._items.popitem(last=False)
+            self._size -= len(evicted)
+
+    def discard(self, key):
+        old = self._items.pop(key, None)
+        if old is not None:
+            self._size -= len(old[1])
+
+
+_cache = ResultCache(RESULT_CACHE_BYTES)
+_flight = SingleFlight()
+
+
+def file_stamp(paths):
+    # ((路徑, 修改時間), ...)；任一檔案不存在時傳回 None
+    try:
+        return tuple((path, os.stat(path).st_mtime_ns) for path in paths)
+    except FileNotFoundError:
+        return None
+
+
+def _load(code, gzipped):
+    """
+    在執行緒中執行：讀取結果檔，傳回 (stamp, bytes)；找不到時傳回 (None, None)。
+    先取得 stamp 再讀檔，讀取期間檔案被改寫時下一次請求會發現 stamp 不符而重新讀取。
+    """
+    filename = app_module.find_result_file(code)
+    if filename is not None and not os.path.exists(filename):
+        # 快取過期時檔案可能已被刪除或改名，重新掃描 html/ 再找一次
+        app_module.get_html_index(refresh=True)
+        filename = app_module.find_result_file(code)
+    if filename is None:
+        return None, None
+    paths = [filename]
+    if gzipped:
+        paths.append(os.path.join(app_module.HTML_GZ_DIR, os.path.basename(filename) + ".gz"))
+    stamp = file_stamp(paths)
+    if gzipped:
+        return stamp, app_module.read_result_gzip(code)
+    content = app_module.read_result(code)
+    return stamp, None if content is None else content.encode("utf-8")
+
+
+async def load_result(code, gzipped=False):
+    key = (code.lower(), gzipped)
+    entry = _cache.get(key)
+    if entry is not None:
+        stamp, data = entry
+        # 與 Flask 版相同會察覺 html/ 的檔案被更新：stat 很便宜，直接在事件迴圈上執行
+        if file_stamp(path for path, _ in stamp) == stamp:
+            return data
+        _cache.discard(key)
+    stamp, data = await _flight.do(key, _load, code, gzipped)
+    if data is not None and stamp is not None:
+        _cache.put(key, stamp, data)
+    return data
+
+
+async def send_response(send, status, body, content_type, extra_headers=()):
+    headers = [
+        (b"content-type", content_type.encode("latin-1")),
+        (b"content-length", str(len(body)).encode("latin-1")),
+    ]
+    headers.extend(extra_headers)
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_json(send, status, payload):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await send_response(send, status, body, "application/json")
+
+
+def accepts_gzip(scope):
+    """
+    依 Accept-Encoding 的品質值判斷（與 werkzeug 相同）：明列的 gzip 優先，其次為 *；
+    "gzip;q=0" 表示拒絕。
+    """
+    qualities = {}
+    for name, value in scope.get("headers", []):
+        if name != b"accept-encoding":
+            continue
+        for item in value.decode("latin-1").split(","):
+            coding, *params = [part.strip() for part in item.split(";")]
+            quality = 1.0
+            for param in params:
+                key, _, val = param.partition("=")
+                if key.strip().lower() == "q":
+                    try:
+                        quality = float(val)
+                    except ValueError:
+                        quality = 0.0
+            if coding:
+                qualities[coding.lower()] = quality
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+async def get_result(scope, send, code):
+    target = code.lower() + ".html"
+    if accepts_gzip(scope):
+        packed = await load_result(code, gzipped=True)
+        if packed is not None:
+            await send_response(send, 200, packed, "text/html; charset=utf-8",
+                                [(b"content-encoding", b"gzip"), (b"vary", b"Accept-Encoding")])
+            return
+    content = await load_result(code)
+    if content is None:
+        logger.error(f"找不到檔案 {target}")
+        content = f"<p>找不到結果檔案: {target}</p>".encode("utf-8")
+    await send_response(send, 200, content, "text/html; charset=utf-8")
+
+
+async def api_results(scope, send):
+    query = parse_qs(scope.get("query_string", b"").decode("utf-8"))
+    codes, error = app_module.parse_batch_codes(",".join(query.get("codes", [])))
+    if error:
+        await send_json(send, 400, {"error": error})
+        return
+
+    # 與 Flask 版相同，同時最多 BATCH_WORKERS 本在讀取中
+    semaphore = asyncio.Semaphore(app_module.BATCH_WORKERS)
+
+    async def fetch(code):
+        async with semaphore:
+            data = await load_result(code)
+        return None if data is None else data.decode("utf-8")
+
+    tasks = [asyncio.ensure_future(fetch(code)) for code in codes]
+    logger.info(f"批次讀取 {len(codes)} 本: {','.join(codes)}")
+
+    if query.get("format", [""])[0] == "ndjson":
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/x-ndjson")],
+        })
+        for code, task in zip(codes, tasks):
+            content = await task
+            line = json.dumps({"code": code, "found": content is not None, "html": content},
+                              ensure_ascii=False) + "\n"
+            await send({"type": "http.response.body", "body": line.encode("utf-8"), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+        return
+
+    payload = {"results": [], "missing": []}
+    for code, content in zip(codes, await asyncio.gather(*tasks)):
+        if content is None:
+            payload["missing"].append(code)
+        else:
+            payload["results"].append({"code": code, "html": content})
+    await send_json(send, 200, payload)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # 與 serve.py 相同，在開始接受請求前載入所有資料；失敗時回報，讓伺服器不要啟動
+            try:
+                await asyncio.to_thread(app_module.preload_data)
+            except Exception as e:
+                logger.exception(f"預先載入資料失敗: {e}")
+                await send({"type": "lifespan.startup.failed", "message": f"預先載入資料失敗: {e}"})
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+flask_asgi = WsgiToAsgi(app_module.app)
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] == "http" and scope["method"] == "GET":
+        path = scope["path"]
+        if path.startswith("/get_result/") and "/" not in path[len("/get_result/"):]:
+            await get_result(scope, send, path[len("/get_result/"):])
+            return
+        if path == "/api/results":
+            await api_results(scope, send)
+            return
+    await flask_asgi(scope, receive, send)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    host, _, port = os.environ.get("WEB_BIND", "0.0.0.0:5000").rpartition(":")
+    workers = int(os.environ.get("WEB_WORKERS") or os.cpu_count() or 1)
+    uvicorn.run("asgi:application", host=host, port=int(port), workers=workers)
+    sys.exit(0)
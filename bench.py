@@ -0,0 +1,345 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MY_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+WORDS6_JSON_DIR = os.path.join(MY_SCRIPT_DIR, "words6_json")
+
+# 負載測試的路由清單（新增路由時一併加入，以便比較前後效能）
+ROUTES = [
+    "/",
+    "/download_csv",
+    "/get_result/T0848",
+    "/get_result/T1092",
+    "/get_result/nonexistent",
+    "/api/results?codes=T0848,T0849,T0850,T0851,T1092",
+    "/api/results?codes=T0848,T0849,T0850,T0851,T1092&format=ndjson",
+    "/api/density",
+    "/api/density?codes=T0848,T1092&by=category",
+    "/export?format=zip&codes=T0848",
+    "/export?format=ndjson&codes=T0848",
+    "/api/books?juan_min=2&juan_max=7&term=曼荼羅",
+    "/api/sql/book_top_terms?code=T0848",
+]
+
+# 量測啟動時間用的子程序腳本：從 import app 到第一個回應；另外回報第一個回應的時刻，
+# 由父程序換算成從建立程序（含直譯器啟動）起算的時間
+STARTUP_SCRIPT = """
+import json, os, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {root!r})
+os.chdir({root!r})
+import logging
+logging.disable(logging.CRITICAL)
+import app
+t1 = time.perf_counter()
+resp = app.app.test_client().get("/")
+t2 = time.perf_counter()
+print(json.dumps({{"import_s": t1 - t0, "first_response_s": t2 - t0, "first_response_at": time.time(),
+                  "status": resp.status_code}}))
+"""
+
+
+def summarize(samples):
+    """
+    將一組耗時（秒）整理成統計值。
+    """
+    ordered = sorted(samples)
+    n = len(ordered)
+    return {
+        "n": n,
+        "min_s": ordered[0],
+        "median_s": statistics.median(ordered),
+        "mean_s": statistics.mean(ordered),
+        "p95_s": ordered[min(n - 1, int(n * 0.95))],
+        "p99_s": ordered[min(n - 1, int(n * 0.99))],
+        "max_s": ordered[-1],
+    }
+
+
+def pick_books():
+    """
+    依 words6_json 檔案大小挑出最小、中位數與最大的書，另外固定加入 T0848。
+    """
+    files = sorted(
+        (f for f in os.listdir(WORDS6_JSON_DIR) if f.lower().endswith(".json")),
+        key=lambda f: os.path.getsize(os.path.join(WORDS6_JSON_DIR, f))
+    )
+    picked = {
+        "smallest": files[0],
+        "median": files[len(files) // 2],
+        "largest": files[-1],
+        "T0848": "T0848.json",
+    }
+    return {label: os.path.splitext(name)[0] for label, name in picked.items()}
+
+
+def bench_generate_html(repeat):
+    """
+    對挑選出的書執行 generate_html() 的微基準測試，輸出寫入暫存目錄。
+    """
+    from test_gen_html import generate_html
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, code in pick_books().items():
+            json_path = os.path.join(WORDS6_JSON_DIR, code + ".json")
+            html_path = os.path.join(tmp, code + ".html")
+            samples = []
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_html(json_path, html_path)  # 暖身
+                for _ in range(repeat):
+                    t0 = time.perf_counter()
+                    generate_html(json_path, html_path)
+                    samples.append(time.perf_counter() - t0)
+            stats = summarize(samples)
+            stats["label"] = label
+            stats["bytes"] = os.path.getsize(json_path)
+            results[code] = stats
+            print(f"generate_html {code} ({label}): median {stats['median_s'] * 1000:.2f} ms")
+    return results
+
+
+def bench_routes(requests_per_route, concurrency):
+    """
+    以 Flask test client 在固定併發數下對每個路由做程序內負載測試。
+    """
+    import logging
+    logging.disable(logging.CRITICAL)
+    import app as app_module
+
+    flask_app = app_module.app
+
+    def hit(path):
+        client = flask_app.test_client()
+        t0 = time.perf_counter()
+        resp = client.get(path)
+        resp.get_data()
+        return time.perf_counter() - t0, resp.status_code
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for path in ROUTES:
+            list(pool.map(hit, [path] * concurrency))  # 暖身
+            t0 = time.perf_counter()
+            outcomes = list(pool.map(hit, [path] * requests_per_route))
+            wall = time.perf_counter() - t0
+            stats = summarize([elapsed for elapsed, _ in outcomes])
+            stats["concurrency"] = concurrency
+            stats["rps"] = requests_per_route / wall
+            stats["statuses"] = sorted({status for _, status in outcomes})
+            results[path] = stats
+            print(f"route {path}: {stats['rps']:.1f} req/s, p95 {stats['p95_s'] * 1000:.2f} ms")
+    logging.disable(logging.NOTSET)
+    return results
+
+
+def bench_startup(repeat):
+    """
+    在全新的直譯器中量測 import app.py 到第一個回應的時間，
+    以及從建立程序（含直譯器啟動）到第一個回應的時間。
+    """
+    script = STARTUP_SCRIPT.format(root=MY_SCRIPT_DIR)
+    imports, firsts, processes = [], [], []
+    for _ in range(repeat):
+        spawned_at = time.time()
+        out = subprocess.run(
+            [sys.executable, "-c", script],
+            capture_output=True, text=True, check=True
+        )
+        data = json.loads(out.stdout.strip().splitlines()[-1])
+        imports.append(data["import_s"])
+        firsts.append(data["first_response_s"])
+        processes.append(data["first_response_at"] - spawned_at)
+    results = {
+        "import": summarize(imports),
+        "first_response": summarize(firsts),
+        "process_first_response": summarize(processes),
+    }
+    print(f"startup: import {results['import']['median_s'] * 1000:.1f} ms, "
+          f"first response {results['first_response']['median_s'] * 1000:.1f} ms, "
+          f"process start to first response {results['process_first_response']['median_s'] * 1000:.1f} ms")
+    return results
+
+
+def title_blocks(n_blocks=30, block_chars=20000, seed=0):
+    """
+    沒有經文時的替代文字：以 books.json 的經名隨機串接成與一卷差不多長的區塊，
+    名相與常用字的密度接近實際經文，比隨機漢字更能反映真實情況。
+    """
+    import random
+    from catalogue import load_catalogue
+
+    titles = [book["title"] for book in load_catalogue()["books"]]
+    rng = random.Random(seed)
+    blocks = []
+    for i in range(n_blocks):
+        parts, n = [], 0
+        while n < block_chars:
+            title = rng.choice(titles)
+            parts.append(title)
+            n += len(title) + 1
+        blocks.append((f"titles/{i + 1:03d}", "。".join(parts)))
+    return blocks
+
+
+def bench_prefilter(paths, repeat):
+    """
+    比較 prefilter.CharPrefilter.scan() 與逐一 str.count 的 count_literal() 在整批卷上的耗時，
+    並確認兩者結果相同。paths 為 .epub / .xhtml 經文，省略時改用 title_blocks()。
+    """
+    import prefilter
+
+    pf = prefilter.CharPrefilter.from_lexicon()
+    blocks = list(prefilter.iter_blocks(paths)) if paths else title_blocks()
+    texts = [text for _, text in blocks]
+
+    scan_samples, full_samples = [], []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        scanned = [pf.scan(text) for text in texts]
+        scan_samples.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        full = [prefilter.count_literal(text, pf.terms) for text in texts]
+        full_samples.append(time.perf_counter() - t0)
+
+    results = {
+        "scan": summarize(scan_samples),
+        "count_literal": summarize(full_samples),
+    }
+    results["scan"]["identical"] = scanned == full
+    results["scan"]["source"] = ", ".join(paths) if paths else "books.json titles"
+    results["scan"]["blocks"] = len(texts)
+    results["scan"]["chars"] = sum(len(text) for text in texts)
+    speedup = results["count_literal"]["median_s"] / results["scan"]["median_s"]
+    results["scan"]["speedup"] = speedup
+    print(f"prefilter ({results['scan']['source']}, {len(texts)} 卷): "
+          f"scan {results['scan']['median_s'] * 1000:.1f} ms, "
+          f"count_literal {results['count_literal']['median_s'] * 1000:.1f} ms, "
+          f"{speedup:.2f}x, 結果{'相同' if scanned == full else '不同！'}")
+    return results
+
+
+def run(args):
+    results = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "generate_html": bench_generate_html(args.repeat),
+        "routes": bench_routes(args.requests, args.concurrency),
+        "startup": bench_startup(args.startup_repeat),
+        "prefilter": bench_prefilter(args.juan_text, args.prefilter_repeat),
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"已寫入 {args.output}")
+    return 0
+
+
+def flatten_metrics(results):
+    """
+    將結果攤平成 {指標名稱: (數值, 是否越大越好)}。
+    只比較中位數、p95 與吞吐量，其餘欄位僅供參考。
+    """
+    metrics = {}
+    for section in ("generate_html", "routes", "startup", "prefilter"):
+        for name, stats in results.get(section, {}).items():
+            for key in ("median_s", "p95_s"):
+                if key in stats:
+                    metrics[f"{section}:{name}:{key}"] = (stats[key], False)
+            if "rps" in stats:
+                metrics[f"{section}:{name}:rps"] = (stats["rps"], True)
+    return metrics
+
+
+def route_statuses(results):
+    """
+    {路由: HTTP 狀態碼列表}。路由改為回傳 404/500 時通常反而變快，必須另外比較。
+    """
+    return {path: stats.get("statuses", []) for path, stats in results.get("routes", {}).items()}
+
+
+def compare(args):
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline_results = json.load(f)
+    with open(args.current, "r", encoding="utf-8") as f:
+        current_results = json.load(f)
+    baseline = flatten_metrics(baseline_results)
+    current = flatten_metrics(current_results)
+
+    regressions = 0
+    old_statuses = route_statuses(baseline_results)
+    new_statuses = route_statuses(current_results)
+    for path in sorted(old_statuses):
+        if path in new_statuses and new_statuses[path] != old_statuses[path]:
+            print(f"!! routes:{path}:statuses: {old_statuses[path]} -> {new_statuses[path]}")
+            regressions += 1
+    if current_results.get("prefilter", {}).get("scan", {}).get("identical") is False:
+        print("!! prefilter:scan:identical: 結果與 count_literal 不同")
+        regressions += 1
+    for name in sorted(baseline):
+        if name not in current:
+            print(f"  (缺少) {name}")
+            continue
+        old, higher_is_better = baseline[name]
+        new, _ = current[name]
+        if old == 0:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        mark = "  "
+        if worse > args.threshold:
+            mark = "!!"
+            regressions += 1
+        print(f"{mark} {name}: {old:.6g} -> {new:.6g} ({change:+.1%})")
+    for name in sorted(set(current) - set(baseline)):
+        print(f"  (新增) {name}")
+
+    if regressions:
+        print(f"發現 {regressions} 項退步（耗時或吞吐量超過 {args.threshold:.0%}、路由的狀態碼改變或 prefilter 結果不同）")
+        return 1
+    print("沒有超過門檻的退步")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="generate_html 與 Flask 路由的效能基準測試")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="執行基準測試並寫出 JSON 結果")
+    p_run.add_argument("-o", "--output", default="bench_results.json")
+    p_run.add_argument("--repeat", type=int, default=20, help="generate_html 每本書的重複次數")
+    p_run.add_argument("--requests", type=int, default=200, help="每個路由的請求數")
+    p_run.add_argument("--concurrency", type=int, default=8, help="負載測試的併發數")
+    p_run.add_argument("--startup-repeat", type=int, default=5, help="啟動時間的量測次數")
+    p_run.add_argument("--juan-text", nargs="*", default=[],
+                       help="量測 prefilter 用的經文（.epub / .xhtml），省略時以 books.json 經名組成替代文字")
+    p_run.add_argument("--prefilter-repeat", type=int, default=5, help="prefilter 的量測次數")
+    p_run.set_defaults(func=run)
+
+    p_cmp = sub.add_parser("compare", help="比較兩份結果並標示退步")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("current")
+    p_cmp.add_argument("--threshold", type=float, default=0.10, help="退步門檻（比例，預設 0.10）")
+    p_cmp.set_defaults(func=compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+import argparse
+import gzip
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+
+import corpus
+from catalogue import SNAPSHOT_PATH, load_catalogue
+from corpus import COMPILED_DIR
+
+MY_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+HTML_DIR = os.path.join(MY_SCRIPT_DIR, "html")
+HTML_GZ_DIR = os.path.join(COMPILED_DIR, "html_gz")
+
+logger = logging.getLogger(__name__)
+
+
+def build_catalogue_snapshot():
+    if os.path.exists(SNAPSHOT_PATH):
+        os.remove(SNAPSHOT_PATH)
+    catalogue = load_catalogue()
+    return f"{len(catalogue['books'])} 本書"
+
+
+def build_density_arrays():
+    import density
+    data = density.build_density()
+    density.save_density(data)
+    return f"{data['by_group'].shape} → {density.DENSITY_PATH}"
+
+
+def build_term_index():
+    import facets
+    if os.path.exists(facets.TERM_INDEX_PATH):
+        os.remove(facets.TERM_INDEX_PATH)
+    catalogue = load_catalogue()
+    index = facets.load_term_index([book["code"] for book in catalogue["books"]])
+    return f"{len(index['term'])} 個名相、{len(index['group'])} 個群組"
+
+
+def compact_book(data):
+    """
+    去除筆數為 0 的名相（群首詞的 found 亦同），保留 id 與分類結構。
+    """
+    compact = {}
+    for group, info in data.items():
+        item = {"id": info.get("id")}
+        found = info.get(corpus.HEAD_KEY)
+        if isinstance(found, dict) and corpus.entry_total(found) > 0:
+            item[corpus.HEAD_KEY] = found
+        for json_key in corpus.CATEGORY_KEYS:
+            if json_key == corpus.HEAD_KEY:
+                continue
+            words = {word: entry for word, entry in info.get(json_key, {}).items()
+                     if corpus.entry_total(entry) > 0}
+            if words:
+                item[json_key] = words
+        compact[group] = item
+    return compact
+
+
+def build_compact_store():
+    out_dir = corpus.WORDS6_STORE_DIR
+    tmp_dir = out_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    before = after = 0
+    for code in corpus.book_codes(corpus.WORDS6_JSON_DIR):
+        before += os.path.getsize(corpus.book_path(code, corpus.WORDS6_JSON_DIR))
+        data = compact_book(corpus.load_book(code, corpus.WORDS6_JSON_DIR))
+        path = corpus.book_path(code, tmp_dir)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        after += os.path.getsize(path)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return f"{before / 1e6:.1f} MB → {after / 1e6:.1f} MB"
+
+
+def build_html_gzip():
+    """
+    預先以最高壓縮率壓縮 html/ 的結果檔，get_result 對支援 gzip 的客戶端直接送出。
+    """
+    shutil.rmtree(HTML_GZ_DIR, ignore_errors=True)
+    os.makedirs(HTML_GZ_DIR)
+    before = after = 0
+    for name in sorted(os.listdir(HTML_DIR)):
+        if not name.lower().endswith(".html"):
+            continue
+        with open(os.path.join(HTML_DIR, name), "rb") as f:
+            raw = f.read()
+        packed = gzip.compress(raw, compresslevel=9, mtime=0)
+        with open(os.path.join(HTML_GZ_DIR, name + ".gz"), "wb") as f:
+            f.write(packed)
+        before += len(raw)
+        after += len(packed)
+    return f"{before / 1e6:.1f} MB → {after / 1e6:.1f} MB"
+
+
+def build_sqlite():
+    import sqlite_db
+    sqlite_db.build_database()
+    return f"{os.path.getsize(sqlite_db.DB_PATH) / 1e6:.1f} MB → {sqlite_db.DB_PATH}"
+
+
+def check_corpus():
+    import check_corpus as checker
+    report = checker.run_check()
+    if report["files_failed"]:
+        names = ", ".join(result["file"] for result in report["files"] if not result["ok"])
+        raise RuntimeError(f"{report['files_failed']} 個檔案未通過檢查: {names}")
+    return f"{report['files_checked']} 個檔案通過"
+
+
+STEPS = [
+    # (名稱, 函式, 是否需要 words6_json)
+    ("catalogue", build_catalogue_snapshot, False),
+    ("density", build_density_arrays, True),
+    ("term_index", build_term_index, True),
+    ("words6_min", build_compact_store, True),
+    ("html_gz", build_html_gzip, False),
+    ("sqlite", build_sqlite, True),
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=f"預先編譯所有資料產物到 {COMPILED_DIR}")
+    parser.add_argument("steps", nargs="*",
+                        help=f"只執行指定的步驟（{', '.join(name for name, _, _ in STEPS)}），省略時全部執行")
+    parser.add_argument("--check", action="store_true", help="編譯前先執行 check_corpus，有問題即中止")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    unknown = set(args.steps) - {name for name, _, _ in STEPS}
+    if unknown:
+        parser.error(f"未知的步驟: {', '.join(sorted(unknown))}")
+
+    steps = [step for step in STEPS if not args.steps or step[0] in args.steps]
+    if any(needs_json for _, _, needs_json in steps) and not os.path.isdir(corpus.WORDS6_JSON_DIR):
+        print(f"找不到 {corpus.WORDS6_JSON_DIR}", file=sys.stderr)
+        return 1
+    if args.check:
+        steps.insert(0, ("check", check_corpus, True))
+
+    t_all = time.perf_counter()
+    for name, func, _ in steps:
+        t0 = time.perf_counter()
+        try:
+            detail = func()
+        except Exception as e:
+            print(f"[{name}] 失敗: {e}", file=sys.stderr)
+            return 1
+        print(f"[{name}] {detail}（{time.perf_counter() - t0:.2f} 秒）")
+    print(f"完成，共耗時 {time.perf_counter() - t_all:.2f} 秒，產物位於 {COMPILED_DIR}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+
+import corpus
+from corpus import BOOKS_JSON_PATH, COMPILED_DIR
+
+SNAPSHOT_PATH = os.path.join(COMPILED_DIR, "catalogue.json")
+
+# 衍生結構的格式有變動時請遞增，舊快照會自動失效並重建
+CATALOGUE_VERSION = 3
+
+logger = logging.getLogger(__name__)
+
+
+def parse_juans(values):
+    try:
+        return int(values[0])
+    except (TypeError, ValueError, IndexError):
+        return 0
+
+
+def build_catalogue(books_data):
+    """
+    由 books.json 的內容建立所有衍生結構：
+    books（保留來源清單與卷數）、book_list（代碼 → 經名）、formatted_books（下拉選單用字串），
+    以及 facets：每個分面值對應一個位元集合，第 i 個位元代表 books[i]。
+    """
+    book_list = {}
+    sources = {}
+    for docx, inner in books_data.items():
+        logger.info(f"處理檔案: {docx}")
+        for code, values in inner.items():
+            if isinstance(values, list) and len(values) >= 2:
+                book_list[code] = values[1]
+                sources[code] = (docx, parse_juans(values))
+
+    books = []
+    collection_bits = {}
+    juan_bits = {}
+    for i, (code, title) in enumerate(sorted(book_list.items())):
+        collection, juans = sources[code]
+        books.append({"code": code, "title": title, "collection": collection, "juans": juans})
+        collection_bits[collection] = collection_bits.get(collection, 0) | (1 << i)
+        juan_bits[juans] = juan_bits.get(juans, 0) | (1 << i)
+
+    return expand_catalogue(books, {
+        "collection": collection_bits,
+        "juans": dict(sorted(juan_bits.items())),
+    })
+
+
+def expand_catalogue(books, facets):
+    """
+    由 books 衍生 book_list 與 formatted_books。快照只保存 books 與 facets，載入時再衍生，
+    避免同樣的經名在檔案中存三次。
+    """
+    return {
+        "book_list": {book["code"]: book["title"] for book in books},
+        "formatted_books": [f"({book['code']}) {book['title']}" for book in books],
+        "books": books,
+        "facets": facets,
+    }
+
+
+def pack_books(books):
+    # 快照中每本書存成 [代碼, 經名, 來源索引, 卷數]，來源檔名只存一次
+    collections = sorted({book["collection"] for book in books})
+    index = {name: i for i, name in enumerate(collections)}
+    return {
+        "collections": collections,
+        "books": [[book["code"], book["title"], index[book["collection"]], book["juans"]] for book in books],
+    }
+
+
+def unpack_books(packed):
+    collections = packed["collections"]
+    return [
+        {"code": code, "title": title, "collection": collections[collection], "juans": juans}
+        for code, title, collection, juans in packed["books"]
+    ]
+
+
+def encode_facets(facets):
+    # JSON 不支援大整數與整數鍵，位元集合以十六進位字串保存
+    return {name: {str(value): format(bits, "x") for value, bits in values.items()}
+            for name, values in facets.items()}
+
+
+def decode_facets(facets):
+    decoded = {}
+    for name, values in facets.items():
+        decoded[name] = {
+            (int(value) if name == "juans" else value): int(bits, 16)
+            for value, bits in values.items()
+        }
+    return decoded
+
+
+def read_snapshot(snapshot_path, source_hash):
+    """
+    讀取快照；版本或來源雜湊不符時傳回 None。
+    """
+    try:
+        with open(snapshot_path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"讀取快照 {snapshot_path} 發生錯誤: {e}")
+        return None
+    if snapshot.get("version") != CATALOGUE_VERSION:
+        logger.info(f"快照版本 {snapshot.get('version')} 與目前版本 {CATALOGUE_VERSION} 不符，重新建立")
+        return None
+    if snapshot.get("source_sha256") != source_hash:
+        logger.info("books.json 已變更，重新建立快照")
+        return None
+    data = snapshot["data"]
+    return expand_catalogue(unpack_books(data), decode_facets(data["facets"]))
+
+
+def write_snapshot(snapshot_path, source_hash, data):
+    """
+    先寫入暫存檔再改名，避免多個程序同時啟動時讀到寫一半的快照。
+    """
+    snapshot = {
+        "version": CATALOGUE_VERSION,
+        "source_sha256": source_hash,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "data": dict(pack_books(data["books"]), facets=encode_facets(data["facets"])),
+    }
+    corpus.write_json_atomic(snapshot_path, snapshot, separators=(",", ":"))
+
+
+def load_catalogue(books_json_path=BOOKS_JSON_PATH, snapshot_path=SNAPSHOT_PATH):
+    """
+    載入目錄資料：來源雜湊相符時直接使用快照，否則解析 books.json 重建並更新快照。
+    books.json 讀取失敗時傳回空目錄。
+    """
+    try:
+        with open(books_json_path, "rb") as f:
+            raw = f.read()
+    except Exception as e:
+        logger.error(f"讀取 books.json 發生錯誤: {e}")
+        return build_catalogue({})
+
+    source_hash = hashlib.sha256(raw).hexdigest()
+    data = read_snapshot(snapshot_path, source_hash)
+    if data is not None:
+        logger.info(f"使用目錄快照: {snapshot_path}")
+        return data
+
+    try:
+        books_data = json.loads(raw.decode("utf-8"))
+        logger.info(f"成功讀取 books.json: {books_json_path}")
+    except Exception as e:
+        logger.error(f"讀取 books.json 發生錯誤: {e}")
+        return build_catalogue({})
+
+    data = build_catalogue(books_data)
+    try:
+        write_snapshot(snapshot_path, source_hash, data)
+        logger.info(f"已寫入目錄快照: {snapshot_path}")
+    except Exception as e:
+        # 唯讀檔案系統等情況下仍可正常服務，只是下次啟動要再重建
+        logger.warning(f"寫入目錄快照失敗: {e}")
+    return data
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if os.path.exists(SNAPSHOT_PATH):
+        os.remove(SNAPSHOT_PATH)
+    catalogue = load_catalogue()
+    print(f"共 {len(catalogue['formatted_books'])} 個選項，快照: {SNAPSHOT_PATH}")
+    sys.exit(0)
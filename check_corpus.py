@@ -0,0 +1,235 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import corpus
+from corpus import COMPILED_DIR
+
+try:
+    import orjson
+
+    def parse_json(raw):
+        return orjson.loads(raw)
+    JSON_PARSER = "orjson"
+except ImportError:
+    def parse_json(raw):
+        return json.loads(raw.decode("utf-8"))
+    JSON_PARSER = "json"
+
+CACHE_PATH = os.path.join(COMPILED_DIR, "check_corpus_cache.json")
+
+# 每個 worker 程序各自載入一次詞表
+_lexicon = None
+
+
+def _init_worker(lexicon):
+    global _lexicon
+    _lexicon = lexicon
+
+
+def issue(kind, group=None, category=None, word=None, detail=None):
+    return {"type": kind, "group": group, "category": category, "word": word, "detail": detail}
+
+
+def check_entry(group, json_key, word, entry):
+    """
+    檢查單一名相：total 為非負整數，且等於 pages 各頁筆數的總和。
+    """
+    if not isinstance(entry, dict):
+        return [issue("bad_entry", group, json_key, word, f"應為物件，實際為 {type(entry).__name__}")]
+    problems = []
+    total = entry.get("total")
+    pages = entry.get("pages")
+    if not isinstance(total, int) or isinstance(total, bool) or total < 0:
+        problems.append(issue("bad_total", group, json_key, word, repr(total)))
+    if not isinstance(pages, dict):
+        problems.append(issue("bad_pages", group, json_key, word, repr(pages)))
+        return problems
+    bad_counts = {page: cnt for page, cnt in pages.items()
+                  if not isinstance(cnt, int) or isinstance(cnt, bool) or cnt <= 0}
+    if bad_counts:
+        problems.append(issue("bad_page_count", group, json_key, word, bad_counts))
+    elif isinstance(total, int) and total != sum(pages.values()):
+        problems.append(issue("total_mismatch", group, json_key, word,
+                              f"total={total}, sum(pages)={sum(pages.values())}"))
+    return problems
+
+
+def check_data(data, lexicon):
+    """
+    對照 words6.json 詞表檢查一本書的內容，傳回問題列表。
+    """
+    if not isinstance(data, dict):
+        return [issue("bad_schema", detail="最上層應為物件")]
+    problems = []
+    for group in lexicon:
+        if group not in data:
+            problems.append(issue("missing_group", group))
+    for group in data:
+        if group not in lexicon:
+            problems.append(issue("extra_group", group))
+
+    for group, info in data.items():
+        expected = lexicon.get(group)
+        if not isinstance(info, dict):
+            problems.append(issue("bad_schema", group, detail="群組應為物件"))
+            continue
+        if expected is not None and info.get("id") != expected.get("id"):
+            problems.append(issue("id_mismatch", group, detail=f"{info.get('id')!r} != {expected.get('id')!r}"))
+
+        if corpus.HEAD_KEY not in info:
+            problems.append(issue("missing_found", group))
+        else:
+            problems.extend(check_entry(group, corpus.HEAD_KEY, group, info[corpus.HEAD_KEY]))
+
+        for json_key in corpus.CATEGORY_KEYS:
+            if json_key == corpus.HEAD_KEY:
+                continue
+            words = info.get(json_key)
+            if words is None:
+                problems.append(issue("missing_category", group, json_key))
+                continue
+            if not isinstance(words, dict):
+                problems.append(issue("bad_schema", group, json_key, detail="分類應為物件"))
+                continue
+            if expected is not None:
+                expected_words = expected.get(json_key, [])
+                for word in expected_words:
+                    if word not in words:
+                        problems.append(issue("missing_variant", group, json_key, word))
+                expected_set = set(expected_words)
+                for word in words:
+                    if word not in expected_set:
+                        problems.append(issue("stale_variant", group, json_key, word))
+            for word, entry in words.items():
+                problems.extend(check_entry(group, json_key, word, entry))
+    return problems
+
+
+def check_file(path):
+    t0 = time.perf_counter()
+    name = os.path.basename(path)
+    with open(path, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).hexdigest()
+    try:
+        problems = check_data(parse_json(raw), _lexicon)
+    except ValueError as e:
+        problems = [issue("bad_json", detail=str(e))]
+    return {
+        "file": name,
+        "sha256": digest,
+        "ok": not problems,
+        "issues": problems,
+        "seconds": time.perf_counter() - t0,
+    }
+
+
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_cache(path, cache):
+    corpus.write_json_atomic(path, cache, indent=1)
+
+
+def run_check(json_dir=corpus.WORDS6_JSON_DIR, lexicon_path=corpus.LEXICON_PATH,
+              quick=False, workers=None, cache_path=CACHE_PATH):
+    """
+    平行檢查 words6_json 的所有檔案，傳回報告。
+    quick=True 時只檢查內容雜湊與上次通過檢查時不同的檔案（詞表變更時全部重新檢查）。
+    """
+    t0 = time.perf_counter()
+    with open(lexicon_path, "rb") as f:
+        lexicon_raw = f.read()
+    lexicon = parse_json(lexicon_raw)
+    lexicon_hash = hashlib.sha256(lexicon_raw).hexdigest()
+
+    names = sorted(name for name in os.listdir(json_dir) if name.lower().endswith(".json"))
+    cache = load_cache(cache_path) if quick else {}
+    json_dir = os.path.abspath(json_dir)
+    same_source = cache.get("lexicon_sha256") == lexicon_hash and cache.get("json_dir") == json_dir
+    passed = cache.get("files", {}) if same_source else {}
+
+    to_check = []
+    skipped = 0
+    for name in names:
+        path = os.path.join(json_dir, name)
+        if quick and passed.get(name) == file_sha256(path):
+            skipped += 1
+        else:
+            to_check.append(path)
+
+    results = []
+    if to_check:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(lexicon,)) as pool:
+            results = list(pool.map(check_file, to_check, chunksize=8))
+
+    # 快取只記錄通過檢查的檔案，有問題的檔案下次仍會重新檢查
+    current = set(names)
+    new_passed = {name: digest for name, digest in passed.items() if name in current}
+    for result in results:
+        if result["ok"]:
+            new_passed[result["file"]] = result["sha256"]
+        else:
+            new_passed.pop(result["file"], None)
+    try:
+        save_cache(cache_path, {"lexicon_sha256": lexicon_hash, "json_dir": json_dir, "files": new_passed})
+    except OSError as e:
+        print(f"寫入檢查快取失敗: {e}", file=sys.stderr)
+
+    failed = [result for result in results if not result["ok"]]
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "json_dir": json_dir,
+        "lexicon_sha256": lexicon_hash,
+        "parser": JSON_PARSER,
+        "mode": "quick" if quick else "full",
+        "files_total": len(names),
+        "files_checked": len(results),
+        "files_skipped": skipped,
+        "files_failed": len(failed),
+        "issues_total": sum(len(result["issues"]) for result in failed),
+        "seconds": time.perf_counter() - t0,
+        "files": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="檢查 words6_json 與 words6.json 詞表及資料格式是否一致")
+    parser.add_argument("--json-dir", default=corpus.WORDS6_JSON_DIR)
+    parser.add_argument("--lexicon", default=corpus.LEXICON_PATH)
+    parser.add_argument("--quick", action="store_true", help="只檢查內容有變更的檔案")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="平行程序數，預設為 CPU 核心數")
+    parser.add_argument("-o", "--output", default="check_report.json", help="報告輸出位置（JSON）")
+    args = parser.parse_args(argv)
+
+    report = run_check(args.json_dir, args.lexicon, quick=args.quick, workers=args.workers)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for result in report["files"]:
+        if not result["ok"]:
+            kinds = sorted({item["type"] for item in result["issues"]})
+            print(f"{result['file']}: {len(result['issues'])} 個問題 ({', '.join(kinds)})")
+    print(f"檢查 {report['files_checked']} 個檔案（略過 {report['files_skipped']} 個未變更），"
+          f"{report['files_failed']} 個有問題，耗時 {report['seconds']:.2f} 秒；報告: {args.output}")
+    return 1 if report["files_failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
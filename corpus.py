@@ -0,0 +1,149 @@
+import contextlib
+import hashlib
+import json
+import os
+import re
+
+MY_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BOOKS_JSON_PATH = os.path.join(MY_SCRIPT_DIR, "books.json")
+# 預先編譯的資料產物都放在 compiled/ 之下
+COMPILED_DIR = os.environ.get("COMPILED_DIR", os.path.join(MY_SCRIPT_DIR, "compiled"))
+WORDS6_JSON_DIR = os.environ.get("WORDS6_JSON_DIR", os.path.join(MY_SCRIPT_DIR, "words6_json"))
+LEXICON_PATH = os.path.join(MY_SCRIPT_DIR, "words6.json")
+# build_data.py 產生的精簡版 words6_json（省略筆數為 0 的名相、不縮排），
+# 正式映像只帶這份；沒有原始目錄時讀取資料改用它
+WORDS6_STORE_DIR = os.path.join(COMPILED_DIR, "words6_min")
+READ_DIR = WORDS6_JSON_DIR if os.path.isdir(WORDS6_JSON_DIR) else WORDS6_STORE_DIR
+
+# 群首詞本身的筆數記在 "found"，其餘分類與 test_gen_html.py 的輸出順序相同
+HEAD_KEY = "found"
+CATEGORIES = [
+    (HEAD_KEY, "群首詞"),
+    ("異體字", "異體字"),
+    ("同義詞/近義詞(意譯)", "同義詞"),
+    ("複合詞", "複合詞"),
+    ("相關詞", "相關詞"),
+    ("音譯詞", "音譯詞")
+]
+CATEGORY_KEYS = [json_key for json_key, _ in CATEGORIES]
+
+JUAN_PAGE_RE = re.compile(r"^juans/(\d+)\.xhtml$")
+
+
+def book_codes(json_dir=WORDS6_JSON_DIR):
+    """
+    words6_json 目錄中所有書的代碼（依檔名排序）。
+    """
+    return sorted(
+        os.path.splitext(name)[0]
+        for name in os.listdir(json_dir)
+        if name.lower().endswith(".json")
+    )
+
+
+def book_path(code, json_dir=WORDS6_JSON_DIR):
+    return os.path.join(json_dir, code + ".json")
+
+
+def load_book(code, json_dir=WORDS6_JSON_DIR):
+    with open(book_path(code, json_dir), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_lexicon(path=LEXICON_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def group_id(info):
+    try:
+        return int(info.get("id", "0"))
+    except (TypeError, ValueError):
+        return 0
+
+
+def sorted_groups(data):
+    """
+    依 id 排序的 (群首詞, 內容) 列表，與 generate_html() 的順序一致。
+    """
+    return sorted(data.items(), key=lambda kv: group_id(kv[1]))
+
+
+def iter_entries(data):
+    """
+    逐一產生 (群首詞, 分類鍵, 字詞, {"total", "pages"})。
+    群首詞本身以分類鍵 "found"、字詞為群首詞表示；沒有 found 的群組略過該筆。
+    """
+    for group, info in sorted_groups(data):
+        for json_key in CATEGORY_KEYS:
+            if json_key == HEAD_KEY:
+                entry = info.get(HEAD_KEY)
+                if isinstance(entry, dict):
+                    yield group, json_key, group, entry
+                continue
+            for word, entry in info.get(json_key, {}).items():
+                yield group, json_key, word, entry
+
+
+def entry_total(entry):
+    try:
+        return int(entry.get("total", 0))
+    except (TypeError, ValueError, AttributeError):
+        return 0
+
+
+def juan_number(page):
+    """
+    "juans/005.xhtml" → 5；back.xhtml 等非卷頁面傳回 None。
+    """
+    m = JUAN_PAGE_RE.match(page)
+    return int(m.group(1)) if m else None
+
+
+def corpus_fingerprint(json_dir=WORDS6_JSON_DIR):
+    """
+    以檔名、大小與修改時間組成的便宜指紋，用來判斷預先編譯的產物是否過期，
+    不必讀取整個 53 MB 的目錄。
+    """
+    parts = []
+    for name in sorted(os.listdir(json_dir)):
+        st = os.stat(os.path.join(json_dir, name))
+        parts.append(f"{name}:{st.st_size}:{st.st_mtime_ns}")
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def fingerprint_matches(fingerprint, json_dir=WORDS6_JSON_DIR):
+    """
+    預先編譯的產物是否仍可使用：沒有 words6_json 目錄（只含編譯產物的映像）時一律信任現有檔案，
+    否則比對產物記錄的指紋。
+    """
+    return not os.path.isdir(json_dir) or fingerprint == corpus_fingerprint(json_dir)
+
+
+@contextlib.contextmanager
+def atomic_path(path, suffix=""):
+    """
+    先寫入暫存檔再改名，其他程序不會讀到寫一半的檔案：
+
+        with atomic_path(path) as tmp_path:
+            寫入 tmp_path
+
+    區塊正常結束才改名為 path；發生例外時刪除暫存檔。suffix 供 np.savez 等會自動補副檔名的寫入方式使用。
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp{suffix}"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json_atomic(path, data, **dump_kwargs):
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, **dump_kwargs)
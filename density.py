@@ -0,0 +1,177 @@
+import io
+import logging
+import os
+import sys
+
+import numpy as np
+
+import corpus
+from catalogue import load_catalogue
+from corpus import COMPILED_DIR
+
+DENSITY_PATH = os.path.join(COMPILED_DIR, "density.npz")
+
+# 陣列格式有變動時請遞增
+DENSITY_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+def read_juan_counts(codes):
+    """
+    目錄（books.json）中記錄的卷數；沒有記錄或無法解析時為 0。
+    """
+    declared = {book["code"]: book["juans"] for book in load_catalogue()["books"]}
+    return np.array([declared.get(code, 0) for code in codes], dtype=np.int16)
+
+
+def build_density(json_dir=corpus.WORDS6_JSON_DIR, lexicon_path=corpus.LEXICON_PATH):
+    """
+    掃描 words6_json 一次，建立 書×卷 的名相命中密度陣列：
+        by_category[b, j, c]  第 b 本書第 j+1 卷中分類 c 的命中筆數
+        by_group[b, j, g]     第 b 本書第 j+1 卷中群組 g（群首詞及其所有變體）的命中筆數
+    只計入 juans/NNN.xhtml，back.xhtml 等非卷頁面不列入。
+    同一字詞出現在多個群組時各自計算，與 generate_html() 的名相總筆數一致。
+    """
+    codes = corpus.book_codes(json_dir)
+    lexicon = corpus.load_lexicon(lexicon_path)
+    groups = [group for group, _ in corpus.sorted_groups(lexicon)]
+    group_index = {group: i for i, group in enumerate(groups)}
+    category_index = {key: i for i, key in enumerate(corpus.CATEGORY_KEYS)}
+
+    # 先收集所有 (書, 卷, 分類, 群組, 筆數)，最後以 np.add.at 一次累加
+    b_idx, j_idx, c_idx, g_idx, counts = [], [], [], [], []
+    for b, code in enumerate(codes):
+        data = corpus.load_book(code, json_dir)
+        for group, json_key, word, entry in corpus.iter_entries(data):
+            if group not in group_index:
+                # 詞表沒有的群組排在最後，避免靜默遺漏
+                group_index[group] = len(groups)
+                groups.append(group)
+            for page, cnt in entry.get("pages", {}).items():
+                juan = corpus.juan_number(page)
+                if juan is None or not cnt:
+                    continue
+                b_idx.append(b)
+                j_idx.append(juan - 1)
+                c_idx.append(category_index[json_key])
+                g_idx.append(group_index[group])
+                counts.append(cnt)
+
+    b_arr = np.array(b_idx, dtype=np.intp)
+    j_arr = np.array(j_idx, dtype=np.intp)
+    c_arr = np.array(c_idx, dtype=np.intp)
+    g_arr = np.array(g_idx, dtype=np.intp)
+    cnt_arr = np.array(counts, dtype=np.int32)
+    n_juans = int(j_arr.max()) + 1 if len(j_arr) else 0
+
+    by_category = np.zeros((len(codes), n_juans, len(category_index)), dtype=np.int32)
+    by_group = np.zeros((len(codes), n_juans, len(groups)), dtype=np.int32)
+    np.add.at(by_category, (b_arr, j_arr, c_arr), cnt_arr)
+    np.add.at(by_group, (b_arr, j_arr, g_arr), cnt_arr)
+
+    return {
+        "version": np.array(DENSITY_VERSION),
+        "fingerprint": np.array(corpus.corpus_fingerprint(json_dir)),
+        "codes": np.array(codes),
+        "groups": np.array(groups),
+        "categories": np.array([title for _, title in corpus.CATEGORIES]),
+        "juan_counts": read_juan_counts(codes),
+        "by_category": by_category,
+        "by_group": by_group,
+    }
+
+
+def save_density(data, path=DENSITY_PATH):
+    with corpus.atomic_path(path, suffix=".npz") as tmp_path:
+        np.savez_compressed(tmp_path, **data)
+
+
+def load_density(path=DENSITY_PATH, json_dir=corpus.WORDS6_JSON_DIR):
+    """
+    載入預先編譯的密度陣列；檔案不存在、版本不符或 words6_json 已變更時重新建立。
+    沒有 words6_json 目錄（例如只含編譯產物的映像）時直接使用現有檔案。
+    """
+    data = None
+    try:
+        with np.load(path) as npz:
+            data = {key: npz[key] for key in npz.files}
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"讀取密度陣列 {path} 發生錯誤: {e}")
+
+    if data is not None and int(data["version"]) == DENSITY_VERSION:
+        if corpus.fingerprint_matches(str(data["fingerprint"]), json_dir):
+            logger.info(f"使用密度陣列: {path}")
+            return data
+        logger.info("words6_json 已變更，重新建立密度陣列")
+
+    data = build_density(json_dir)
+    try:
+        save_density(data, path)
+        logger.info(f"已寫入密度陣列: {path}")
+    except Exception as e:
+        logger.warning(f"寫入密度陣列失敗: {e}")
+    return data
+
+
+def select(data, codes=None, by="total", groups=None):
+    """
+    依條件切出密度矩陣，傳回 (陣列, 欄位標籤, 書的列索引)。
+    by="total" → (書, 卷)；by="category" → (書, 卷, 分類)；by="group" → (書, 卷, 群組)。
+    by="group" 必須指定 codes 或 groups，否則整個陣列有數百萬格，丟出 ValueError。
+    codes 或 groups 含未知項目時丟出 KeyError。
+    """
+    if by == "group" and not codes and not groups:
+        raise ValueError("by=group 需指定 codes 或 groups")
+    all_codes = data["codes"].tolist()
+    if codes:
+        code_index = {code.lower(): i for i, code in enumerate(all_codes)}
+        unknown = [code for code in codes if code.lower() not in code_index]
+        if unknown:
+            raise KeyError(unknown)
+        rows = [code_index[code.lower()] for code in codes]
+    else:
+        rows = list(range(len(all_codes)))
+
+    if by == "total":
+        return data["by_category"][rows].sum(axis=2), [], rows
+    if by == "category":
+        return data["by_category"][rows], data["categories"].tolist(), rows
+    if by == "group":
+        all_groups = data["groups"].tolist()
+        if groups:
+            group_index = {group: i for i, group in enumerate(all_groups)}
+            unknown = [group for group in groups if group not in group_index]
+            if unknown:
+                raise KeyError(unknown)
+            cols = [group_index[group] for group in groups]
+            return data["by_group"][rows][:, :, cols], list(groups), rows
+        return data["by_group"][rows], all_groups, rows
+    raise ValueError(f"未知的 by 參數: {by}")
+
+
+def to_npz_bytes(matrix, codes, labels, juan_counts):
+    """
+    壓縮的 .npz：密度陣列幾乎全是 0，壓縮後只剩原本的一小部分。
+    內含 data、codes、labels、juan_counts，可直接以 np.load(io.BytesIO(...)) 讀取。
+    """
+    buf = io.BytesIO()
+    np.savez_compressed(
+        buf,
+        data=matrix,
+        codes=np.array(codes),
+        labels=np.array(labels),
+        juan_counts=np.asarray(juan_counts),
+    )
+    return buf.getvalue()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    density = build_density()
+    save_density(density)
+    print(f"{len(density['codes'])} 本書 × {density['by_category'].shape[1]} 卷 × "
+          f"{len(density['groups'])} 群組，已寫入 {DENSITY_PATH}")
+    sys.exit(0)
@@ -0,0 +1,206 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import corpus
+
+CATEGORY_TITLES = dict(corpus.CATEGORIES)
+
+
+def hash_dir(json_dir):
+    """
+    目錄中每個 JSON 檔的內容雜湊（檔名 → sha256），缺少目錄時為空。
+    """
+    if not os.path.isdir(json_dir):
+        return {}
+    names = sorted(name for name in os.listdir(json_dir) if name.lower().endswith(".json"))
+
+    def digest(name):
+        with open(os.path.join(json_dir, name), "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    with ThreadPoolExecutor() as pool:
+        return dict(zip(names, pool.map(digest, names)))
+
+
+def page_label(page):
+    # 卷頁面以卷號表示，其他頁面（如 back.xhtml）保留原名
+    juan = corpus.juan_number(page)
+    return str(juan) if juan is not None else page
+
+
+def flatten(data):
+    """
+    將一本書攤平成 {(群首詞, 分類, 名相, 頁面): 筆數}，頁面為 None 的鍵代表 total。
+    """
+    flat = {}
+    for group, json_key, word, entry in corpus.iter_entries(data):
+        flat[(group, json_key, word, None)] = corpus.entry_total(entry)
+        for page, cnt in entry.get("pages", {}).items():
+            label = page_label(page)
+            key = (group, json_key, word, label)
+            flat[key] = flat.get(key, 0) + cnt
+    return flat
+
+
+def diff_book(old_data, new_data):
+    """
+    以 numpy 向量比較同一本書的兩次掃描結果，傳回該書的差異；完全相同時傳回 None。
+    """
+    old_flat = flatten(old_data)
+    new_flat = flatten(new_data)
+    keys = list(old_flat.keys() | new_flat.keys())
+    old = np.fromiter((old_flat.get(key, 0) for key in keys), dtype=np.int64, count=len(keys))
+    new = np.fromiter((new_flat.get(key, 0) for key in keys), dtype=np.int64, count=len(keys))
+    delta = new - old
+    changed = np.flatnonzero(delta)
+    if len(changed) == 0:
+        return None
+
+    is_total = np.fromiter((key[3] is None for key in keys), dtype=bool, count=len(keys))
+    total_changed = changed[is_total[changed]]
+    page_changed = changed[~is_total[changed]]
+
+    groups, categories, juans = {}, {}, {}
+    words = {}
+    for i in total_changed:
+        group, json_key, word, _ = keys[i]
+        d = int(delta[i])
+        groups[group] = groups.get(group, 0) + d
+        categories[json_key] = categories.get(json_key, 0) + d
+        words[(group, json_key, word)] = {
+            "group": group,
+            "category": json_key,
+            "word": word,
+            "old": int(old[i]),
+            "new": int(new[i]),
+            "delta": d,
+            "juans": {},
+        }
+    for i in page_changed:
+        group, json_key, word, label = keys[i]
+        d = int(delta[i])
+        juans[label] = juans.get(label, 0) + d
+        item = words.setdefault((group, json_key, word), {
+            "group": group,
+            "category": json_key,
+            "word": word,
+            "old": old_flat.get((group, json_key, word, None), 0),
+            "new": new_flat.get((group, json_key, word, None), 0),
+            "delta": 0,
+            "juans": {},
+        })
+        item["juans"][label] = d
+
+    return {
+        "total_delta": int(delta[is_total].sum()),
+        "groups": {k: v for k, v in groups.items() if v},
+        "categories": {k: v for k, v in categories.items() if v},
+        "juans": {k: v for k, v in sorted(juans.items(), key=lambda kv: juan_sort_key(kv[0])) if v},
+        "words": sorted(words.values(), key=lambda item: (-abs(item["delta"]), item["group"], item["word"])),
+    }
+
+
+def juan_sort_key(label):
+    return (0, int(label), "") if label.isdigit() else (1, 0, label)
+
+
+def load_or_empty(json_dir, name):
+    path = os.path.join(json_dir, name)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def diff_runs(old_dir, new_dir):
+    """
+    比較兩個 words6_json 目錄：先比對每個檔案的內容雜湊，只有雜湊不同的檔案才解析並比較。
+    """
+    t0 = time.perf_counter()
+    old_hashes = hash_dir(old_dir)
+    new_hashes = hash_dir(new_dir)
+    names = sorted(old_hashes.keys() | new_hashes.keys())
+    changed_names = [name for name in names if old_hashes.get(name) != new_hashes.get(name)]
+
+    books = {}
+    for name in changed_names:
+        code = os.path.splitext(name)[0]
+        if name not in old_hashes:
+            status = "added"
+        elif name not in new_hashes:
+            status = "removed"
+        else:
+            status = "changed"
+        result = diff_book(load_or_empty(old_dir, name), load_or_empty(new_dir, name))
+        if result is None:
+            # 內容雜湊不同但計數相同（例如只有排版差異）
+            if status == "changed":
+                continue
+            result = {"total_delta": 0, "groups": {}, "categories": {}, "juans": {}, "words": []}
+        result["status"] = status
+        books[code] = result
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "old": os.path.abspath(old_dir),
+        "new": os.path.abspath(new_dir),
+        "files_total": len(names),
+        "files_hash_changed": len(changed_names),
+        "books_changed": len(books),
+        "seconds": time.perf_counter() - t0,
+        "books": books,
+    }
+
+
+def format_summary(report, top=10):
+    lines = [
+        f"比較 {report['old']} → {report['new']}",
+        f"共 {report['files_total']} 個檔案，{report['files_hash_changed']} 個內容不同，"
+        f"{report['books_changed']} 本書的筆數有變動（{report['seconds']:.2f} 秒）",
+    ]
+    for code, book in sorted(report["books"].items()):
+        lines.append("")
+        lines.append(f"[{code}] {book['status']}，名相總筆數變動 {book['total_delta']:+d}")
+        if book["groups"]:
+            groups = sorted(book["groups"].items(), key=lambda kv: (-abs(kv[1]), kv[0]))
+            line = "  群組: " + "、".join(f"{k} {v:+d}" for k, v in groups[:top])
+            if len(groups) > top:
+                line += f"……另有 {len(groups) - top} 個群組"
+            lines.append(line)
+        if book["categories"]:
+            lines.append("  分類: " + "、".join(f"{CATEGORY_TITLES[k]} {v:+d}" for k, v in book["categories"].items()))
+        if book["juans"]:
+            lines.append("  各卷: " + "、".join(f"{k} {v:+d}" for k, v in book["juans"].items()))
+        for item in book["words"][:top]:
+            lines.append(f"  {item['group']} / {CATEGORY_TITLES[item['category']]} / {item['word']}: "
+                         f"{item['old']} → {item['new']} ({item['delta']:+d})")
+        if len(book["words"]) > top:
+            lines.append(f"  ……另有 {len(book['words']) - top} 個名相")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="比較兩次掃描的 words6_json 目錄，列出各書、群組、分類、名相及各卷的筆數變動")
+    parser.add_argument("old_dir")
+    parser.add_argument("new_dir")
+    parser.add_argument("-o", "--output", default="words6_delta.json", help="機器可讀的差異檔（JSON）")
+    parser.add_argument("--top", type=int, default=10, help="摘要中每本書列出的名相數")
+    args = parser.parse_args(argv)
+
+    report = diff_runs(args.old_dir, args.new_dir)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(format_summary(report, args.top))
+    print(f"\n差異檔: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
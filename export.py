@@ -0,0 +1,164 @@
+import argparse
+import csv
+import io
+import json
+import sys
+import zipfile
+import zlib
+
+import corpus
+
+CATEGORY_TITLES = dict(corpus.CATEGORIES)
+
+
+def iter_book_rows(code, json_dir=corpus.READ_DIR):
+    """
+    逐筆產生一本書的名相資料：(書, 群首詞, 分類, 名相, 筆數, {卷號: 筆數}, 其他頁面筆數)。
+    與 generate_html() 相同只輸出筆數不為 0 的名相；back.xhtml 等非卷頁面合計在「其他頁面筆數」。
+    """
+    data = corpus.load_book(code, json_dir)
+    for group, json_key, word, entry in corpus.iter_entries(data):
+        total = corpus.entry_total(entry)
+        if total == 0:
+            continue
+        juans = {}
+        other = 0
+        for page, cnt in entry.get("pages", {}).items():
+            juan = corpus.juan_number(page)
+            if juan is None:
+                other += cnt
+            else:
+                juans[juan] = juans.get(juan, 0) + cnt
+        yield code, group, CATEGORY_TITLES[json_key], word, total, juans, other
+
+
+def book_csv(code, json_dir=corpus.READ_DIR):
+    """
+    一本書的 CSV 內容，每卷一欄。單本書很小，整本組好再寫入壓縮檔。
+    """
+    rows = list(iter_book_rows(code, json_dir))
+    n_juans = max((max(juans) for *_, juans, _ in rows if juans), default=0)
+
+    si = io.StringIO()
+    writer = csv.writer(si)
+    writer.writerow(["群首詞", "分類", "名相", "筆數"]
+                    + [f"第{n}卷" for n in range(1, n_juans + 1)] + ["其他頁面"])
+    for _, group, category, word, total, juans, other in rows:
+        writer.writerow([group, category, word, total]
+                        + [juans.get(n, 0) for n in range(1, n_juans + 1)] + [other])
+    return si.getvalue().encode("utf-8")
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """
+    不可 seek 的寫入緩衝區，zipfile 寫入的位元組暫存於此，由產生器逐段取出。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(codes, json_dir=corpus.READ_DIR):
+    """
+    逐本產生 ZIP 檔的位元組片段（每本書一個 CSV），任何時候只保留一本書的資料在記憶體中。
+    """
+    buf = _ChunkBuffer()
+    with zipfile.ZipFile(buf, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for code in codes:
+            zf.writestr(f"{code}.csv", book_csv(code, json_dir))
+            chunk = buf.drain()
+            if chunk:
+                yield chunk
+    chunk = buf.drain()
+    if chunk:
+        yield chunk
+
+
+def stream_ndjson_gz(codes, json_dir=corpus.READ_DIR):
+    """
+    逐本產生 gzip 壓縮的 NDJSON 片段，每行一個名相：
+    {"book", "group", "category", "word", "total", "juans": {"1": n, ...}, "other"}
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 → gzip 格式
+    for code in codes:
+        lines = []
+        for book, group, category, word, total, juans, other in iter_book_rows(code, json_dir):
+            lines.append(json.dumps({
+                "book": book,
+                "group": group,
+                "category": category,
+                "word": word,
+                "total": total,
+                "juans": {str(n): cnt for n, cnt in sorted(juans.items())},
+                "other": other,
+            }, ensure_ascii=False))
+        if lines:
+            chunk = compressor.compress(("\n".join(lines) + "\n").encode("utf-8"))
+            if chunk:
+                yield chunk
+    yield compressor.flush()
+
+
+EXPORT_FORMATS = {
+    # format: (產生器, MIME 類型, 預設檔名)
+    "zip": (stream_zip, "application/zip", "words6_csv.zip"),
+    "ndjson": (stream_ndjson_gz, "application/gzip", "words6.ndjson.gz"),
+}
+
+
+def resolve_codes(codes, json_dir=corpus.READ_DIR):
+    """
+    將使用者輸入的代碼（不論大小寫）對應到 words6_json 中的實際代碼；
+    未指定時傳回全部。傳回 (代碼列表, 找不到的代碼列表)。
+    """
+    available = corpus.book_codes(json_dir)
+    if not codes:
+        return available, []
+    by_lower = {code.lower(): code for code in available}
+    found, missing = [], []
+    for code in codes:
+        actual = by_lower.get(code.lower())
+        if actual is None:
+            missing.append(code)
+        elif actual not in found:
+            found.append(actual)
+    return found, missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="匯出 words6_json 為 ZIP（每本一個 CSV）或 gzip NDJSON")
+    parser.add_argument("codes", nargs="*", help="書的代碼，省略時匯出全部")
+    parser.add_argument("-f", "--format", choices=sorted(EXPORT_FORMATS), default="zip")
+    parser.add_argument("-o", "--output", help="輸出檔案，預設依格式命名")
+    args = parser.parse_args(argv)
+
+    codes, missing = resolve_codes(args.codes)
+    if missing:
+        print(f"找不到: {', '.join(missing)}", file=sys.stderr)
+        return 1
+    generate, _, default_name = EXPORT_FORMATS[args.format]
+    output = args.output or default_name
+    size = 0
+    with open(output, "wb") as f:
+        for chunk in generate(codes):
+            f.write(chunk)
+            size += len(chunk)
+    print(f"已匯出 {len(codes)} 本書到 {output}（{size} bytes）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
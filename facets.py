@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+import sys
+
+import corpus
+from catalogue import decode_facets, encode_facets
+from corpus import COMPILED_DIR
+
+TERM_INDEX_PATH = os.path.join(COMPILED_DIR, "term_index.json")
+
+# 索引格式有變動時請遞增
+TERM_INDEX_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+def popcount(bits):
+    return bin(bits).count("1")
+
+
+def iter_bits(bits):
+    """
+    依序產生位元集合中為 1 的位置。
+    """
+    i = 0
+    while bits:
+        if bits & 1:
+            yield i
+        bits >>= 1
+        i += 1
+
+
+def build_term_index(codes, json_dir=corpus.WORDS6_JSON_DIR):
+    """
+    建立「有命中」分面：每個名相（term）與每個群組（group，含群首詞及其所有變體）
+    對應一個位元集合，位元順序與目錄 books 相同。沒有 words6_json 的書不會有任何命中。
+    """
+    terms, groups = {}, {}
+    available = set(corpus.book_codes(json_dir))
+    for i, code in enumerate(codes):
+        if code not in available:
+            continue
+        bit = 1 << i
+        for group, json_key, word, entry in corpus.iter_entries(corpus.load_book(code, json_dir)):
+            if corpus.entry_total(entry) > 0:
+                terms[word] = terms.get(word, 0) | bit
+                groups[group] = groups.get(group, 0) | bit
+    return {"term": terms, "group": groups}
+
+
+def load_term_index(codes, path=TERM_INDEX_PATH, json_dir=corpus.WORDS6_JSON_DIR):
+    """
+    載入預先編譯的名相索引；目錄順序或 words6_json 變更時重新建立。
+    沒有 words6_json 目錄（只含編譯產物的映像）時直接使用現有檔案。
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        snapshot = None
+    except Exception as e:
+        logger.warning(f"讀取名相索引 {path} 發生錯誤: {e}")
+        snapshot = None
+
+    if (snapshot is not None and snapshot.get("version") == TERM_INDEX_VERSION
+            and snapshot.get("codes") == list(codes)):
+        if corpus.fingerprint_matches(snapshot.get("fingerprint"), json_dir):
+            logger.info(f"使用名相索引: {path}")
+            return decode_facets(snapshot["index"])
+        logger.info("words6_json 已變更，重新建立名相索引")
+
+    index = build_term_index(codes, json_dir)
+    try:
+        corpus.write_json_atomic(path, {
+            "version": TERM_INDEX_VERSION,
+            "fingerprint": corpus.corpus_fingerprint(json_dir),
+            "codes": list(codes),
+            "index": encode_facets(index),
+        }, separators=(",", ":"))
+        logger.info(f"已寫入名相索引: {path}")
+    except Exception as e:
+        logger.warning(f"寫入名相索引失敗: {e}")
+    return index
+
+
+def search(catalogue, term_index=None, q=None, collection=None, juan_min=None, juan_max=None,
+           term=None, group=None):
+    """
+    以位元運算組合各分面條件，傳回 (符合的位元集合, 分面計數)。
+    分面計數依慣例套用「其他」分面的條件，讓使用者看得到切換該分面後的結果數。
+    """
+    books = catalogue["books"]
+    facets = catalogue["facets"]
+    everything = (1 << len(books)) - 1
+
+    filters = {}
+    if q:
+        needle = q.lower()
+        bits = 0
+        for i, text in enumerate(catalogue["formatted_books"]):
+            if needle in text.lower():
+                bits |= 1 << i
+        filters["q"] = bits
+    if collection:
+        filters["collection"] = facets["collection"].get(collection, 0)
+    if juan_min is not None or juan_max is not None:
+        low = juan_min if juan_min is not None else 0
+        high = juan_max if juan_max is not None else max(facets["juans"], default=0)
+        bits = 0
+        for juans, juan_bits in facets["juans"].items():
+            if low <= juans <= high:
+                bits |= juan_bits
+        filters["juans"] = bits
+    if term:
+        filters["term"] = term_index["term"].get(term, 0) if term_index else 0
+    if group:
+        filters["group"] = term_index["group"].get(group, 0) if term_index else 0
+
+    def combined(skip=None):
+        bits = everything
+        for name, filter_bits in filters.items():
+            if name != skip:
+                bits &= filter_bits
+        return bits
+
+    others = combined("collection")
+    collection_counts = {name: popcount(bits & others) for name, bits in facets["collection"].items()}
+    others = combined("juans")
+    juan_counts = {juans: popcount(bits & others) for juans, bits in facets["juans"].items()}
+    return combined(), {"collection": collection_counts, "juans": juan_counts}
+
+
+if __name__ == "__main__":
+    from catalogue import load_catalogue
+    logging.basicConfig(level=logging.INFO)
+    catalogue = load_catalogue()
+    if os.path.exists(TERM_INDEX_PATH):
+        os.remove(TERM_INDEX_PATH)
+    index = load_term_index([book["code"] for book in catalogue["books"]])
+    print(f"{len(index['term'])} 個名相、{len(index['group'])} 個群組，已寫入 {TERM_INDEX_PATH}")
+    sys.exit(0)
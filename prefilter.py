@@ -0,0 +1,199 @@
+import argparse
+import html
+import json
+import re
+import sys
+import time
+import zipfile
+from collections import Counter
+
+import corpus
+
+TAG_RE = re.compile(r"<[^>]+>")
+
+
+def lexicon_terms(lexicon):
+    """
+    詞表中所有要比對的字詞：群首詞與各分類的變體，一律照字面比對
+    （與 words6_json 相同，「毘那也迦(毗那也迦)」等含括號或 ○ 的字詞不展開）。
+    """
+    terms = set()
+    for group, info in lexicon.items():
+        terms.add(group)
+        for json_key in corpus.CATEGORY_KEYS:
+            if json_key != corpus.HEAD_KEY:
+                terms.update(info.get(json_key, []))
+    return sorted(term for term in terms if term)
+
+
+def trie_pattern(terms):
+    """
+    將字詞依共同前綴組成正規表示式，例如 真言、真言宗 → 真言(?:宗)?。
+    每個位置最多只需比對一條分支，且因為選擇性群組是貪婪的，傳回的一定是從該位置起最長的字詞。
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        if len(branches) == 1 and "" not in node:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if "" in node else group
+
+    return build(trie)
+
+
+def new_stats():
+    return {
+        "blocks": 0,
+        "blocks_rejected": 0,
+        "chars": 0,
+        "positions_matched": 0,
+    }
+
+
+class CharPrefilter:
+    """
+    以單一正規表示式一次掃描整段文字，取代逐一對每個字詞呼叫 str.count：
+    - 字詞依共同前綴組成一個表示式（trie_pattern）。re 編譯時會取出所有字詞的首字集合，
+      search() 以 C 速度略過不是首字的字元，只在首字處嘗試比對；沒有任何命中的卷直接略過（reject）。
+    - 每個命中位置只傳回最長的字詞；同一位置起的其他字詞必定是它的前綴，預先算好即可一併計入。
+    - 同一字詞的計數與 str.count 相同（由左至右、不重疊）：記錄每個字詞上次命中的結尾，
+      與上次重疊的命中不計。
+    結果與 count_literal() 完全相同（見 test_prefilter.py）。
+    """
+
+    def __init__(self, terms):
+        self.terms = sorted(set(term for term in terms if term))
+        term_set = set(self.terms)
+        # 最長字詞 → 同一位置起所有會命中的字詞（自身及屬於詞表的前綴，由長到短）
+        self._prefixes = {
+            term: [term[:n] for n in range(len(term), 0, -1) if term[:n] in term_set]
+            for term in self.terms
+        }
+        self._pattern = re.compile(trie_pattern(self.terms)) if self.terms else None
+        self.stats = new_stats()
+
+    @classmethod
+    def from_lexicon(cls, path=corpus.LEXICON_PATH):
+        return cls(lexicon_terms(corpus.load_lexicon(path)))
+
+    def scan(self, text):
+        """
+        傳回 Counter {字詞: 筆數}，與 count_literal(text, self.terms) 相同。
+        """
+        stats = self.stats
+        stats["blocks"] += 1
+        stats["chars"] += len(text)
+        counts = Counter()
+        if self._pattern is None:
+            stats["blocks_rejected"] += 1
+            return counts
+
+        search = self._pattern.search
+        prefixes = self._prefixes
+        last_end = {}
+        matched = 0
+        pos = 0
+        while True:
+            m = search(text, pos)
+            if m is None:
+                break
+            start = m.start()
+            matched += 1
+            for term in prefixes[m.group()]:
+                if start >= last_end.get(term, 0):
+                    counts[term] += 1
+                    last_end[term] = start + len(term)
+            pos = start + 1
+
+        stats["positions_matched"] += matched
+        if not matched:
+            stats["blocks_rejected"] += 1
+        return counts
+
+    def summary(self):
+        stats = dict(self.stats)
+        stats["positions_skipped_ratio"] = 1 - stats["positions_matched"] / (stats["chars"] or 1)
+        return stats
+
+
+def count_literal(text, terms):
+    counts = Counter()
+    for term in terms:
+        n = text.count(term)
+        if n:
+            counts[term] = n
+    return counts
+
+
+def xhtml_text(markup):
+    return html.unescape(TAG_RE.sub("", markup))
+
+
+def iter_blocks(paths):
+    """
+    逐一產生 (頁面名稱, 純文字)。epub 內每個 .xhtml 為一個區塊（例如 juans/001.xhtml），
+    其他檔案整個檔案為一個區塊。
+    """
+    for path in paths:
+        if path.lower().endswith(".epub"):
+            with zipfile.ZipFile(path) as zf:
+                for name in sorted(zf.namelist()):
+                    if name.lower().endswith(".xhtml"):
+                        page = name.split("/", 1)[1] if name.count("/") > 1 else name
+                        yield page, xhtml_text(zf.read(name).decode("utf-8"))
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                content = f.read()
+            if path.lower().endswith((".xhtml", ".html", ".htm")):
+                content = xhtml_text(content)
+            yield path, content
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="以首字集合略過不可能命中的位置，一次掃描計算詞表名相的出現次數")
+    parser.add_argument("paths", nargs="+", help=".epub、.xhtml 或純文字檔")
+    parser.add_argument("--lexicon", default=corpus.LEXICON_PATH)
+    parser.add_argument("--compare", action="store_true", help="同時對每個字詞執行 str.count 的完整比對，比較耗時並確認結果相同")
+    parser.add_argument("-o", "--output", help="將各頁面的計數寫成 JSON {字詞: {total, pages}}")
+    args = parser.parse_args(argv)
+
+    prefilter = CharPrefilter.from_lexicon(args.lexicon)
+    blocks = list(iter_blocks(args.paths))
+
+    t0 = time.perf_counter()
+    per_page = [(page, prefilter.scan(text)) for page, text in blocks]
+    filtered_seconds = time.perf_counter() - t0
+
+    stats = prefilter.summary()
+    stats["seconds"] = filtered_seconds
+    if args.compare:
+        t0 = time.perf_counter()
+        full = [count_literal(text, prefilter.terms) for _, text in blocks]
+        stats["seconds_full"] = time.perf_counter() - t0
+        stats["identical"] = full == [counts for _, counts in per_page]
+
+    if args.output:
+        result = {}
+        for page, counts in per_page:
+            for term, n in counts.items():
+                entry = result.setdefault(term, {"total": 0, "pages": {}})
+                entry["total"] += n
+                entry["pages"][page] = n
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=4)
+
+    print(json.dumps(stats, ensure_ascii=False, indent=2))
+    return 0 if stats.get("identical", True) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
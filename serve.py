@@ -0,0 +1,85 @@
+"""
+正式環境的服務入口：在父程序預先載入所有資料與索引，再 fork 出多個 worker，
+唯讀結構以 copy-on-write 方式共用。
+
+環境變數：
+    WEB_BIND                   監聽位址（預設 0.0.0.0:5000）
+    WEB_WORKERS                worker 數（預設為 CPU 核心數）
+    WEB_THREADS                每個 worker 的執行緒數（預設 4）
+    WEB_MAX_REQUESTS           worker 處理多少請求後自動回收（預設 2000，0 表示不回收）
+    WEB_MAX_REQUESTS_JITTER    回收門檻的隨機抖動，避免所有 worker 同時重啟（預設 200）
+    WEB_TIMEOUT                單一請求逾時秒數（預設 30）
+    WEB_GRACEFUL_TIMEOUT       重啟或關閉時等待進行中請求的秒數（預設 30）
+
+平順重啟：對主程序送 SIGHUP，會啟動新 worker 後再優雅關閉舊 worker；
+資料更新後需重新載入時請改送 SIGUSR2（啟動新的主程序）再對舊主程序送 SIGTERM。
+"""
+import gc
+import logging
+import os
+import sys
+
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def gunicorn_options():
+    return {
+        "bind": os.environ.get("WEB_BIND", "0.0.0.0:5000"),
+        "workers": env_int("WEB_WORKERS", os.cpu_count() or 1),
+        "threads": env_int("WEB_THREADS", 4),
+        "worker_class": "gthread",
+        "preload_app": True,
+        "max_requests": env_int("WEB_MAX_REQUESTS", 2000),
+        "max_requests_jitter": env_int("WEB_MAX_REQUESTS_JITTER", 200),
+        "timeout": env_int("WEB_TIMEOUT", 30),
+        "graceful_timeout": env_int("WEB_GRACEFUL_TIMEOUT", 30),
+        "accesslog": "-",
+        "errorlog": "-",
+    }
+
+
+def load_application():
+    """
+    匯入 app 並預先建立所有延遲初始化的資料，
+    之後凍結 GC 讓這些物件在 fork 後不會因為 GC 掃描而被複製。
+    """
+    import app as app_module
+
+    app_module.preload_data()
+    gc.collect()
+    gc.freeze()
+    return app_module.app
+
+
+def main():
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        # Windows 等沒有 gunicorn 的環境退回單程序多執行緒模式
+        logging.basicConfig(level=logging.INFO)
+        logging.getLogger(__name__).warning("找不到 gunicorn，改用 Flask 內建伺服器（單程序）")
+        host, _, port = os.environ.get("WEB_BIND", "0.0.0.0:5000").rpartition(":")
+        load_application().run(host=host, port=int(port), threaded=True)
+        return 0
+
+    class StandaloneApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return load_application()
+
+    StandaloneApplication(gunicorn_options()).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
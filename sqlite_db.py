@@ -0,0 +1,414 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+
+import corpus
+from catalogue import load_catalogue
+from corpus import COMPILED_DIR
+
+DB_PATH = os.path.join(COMPILED_DIR, "words6.sqlite")
+
+# 結構有變動時請遞增
+SCHEMA_VERSION = 1
+
+# 查詢限制：最多傳回的列數與單一查詢的執行時間（秒）
+MAX_ROWS = int(os.environ.get("SQL_MAX_ROWS", "5000"))
+QUERY_TIMEOUT = float(os.environ.get("SQL_QUERY_TIMEOUT", "2"))
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE collections (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE books (
+    id INTEGER PRIMARY KEY,
+    code TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    juans INTEGER NOT NULL,
+    collection_id INTEGER NOT NULL REFERENCES collections(id)
+);
+CREATE TABLE groups (
+    id INTEGER PRIMARY KEY,
+    head TEXT NOT NULL UNIQUE
+);
+CREATE TABLE categories (
+    id INTEGER PRIMARY KEY,
+    json_key TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL UNIQUE
+);
+CREATE TABLE terms (
+    id INTEGER PRIMARY KEY,
+    group_id INTEGER NOT NULL REFERENCES groups(id),
+    category_id INTEGER NOT NULL REFERENCES categories(id),
+    word TEXT NOT NULL,
+    UNIQUE (group_id, category_id, word)
+);
+-- 只存筆數不為 0 的名相；juan 為 NULL 表示 back.xhtml 等非卷頁面
+CREATE TABLE hits (
+    book_id INTEGER NOT NULL REFERENCES books(id),
+    term_id INTEGER NOT NULL REFERENCES terms(id),
+    total INTEGER NOT NULL,
+    PRIMARY KEY (book_id, term_id)
+) WITHOUT ROWID;
+CREATE TABLE juan_hits (
+    book_id INTEGER NOT NULL REFERENCES books(id),
+    term_id INTEGER NOT NULL REFERENCES terms(id),
+    page TEXT NOT NULL,
+    juan INTEGER,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (book_id, term_id, page)
+) WITHOUT ROWID;
+"""
+
+INDEXES = """
+CREATE INDEX books_collection ON books(collection_id);
+CREATE INDEX books_juans ON books(juans);
+CREATE INDEX terms_word ON terms(word);
+CREATE INDEX terms_category ON terms(category_id, group_id);
+CREATE INDEX hits_term ON hits(term_id, total);
+CREATE INDEX juan_hits_term ON juan_hits(term_id, juan);
+"""
+
+# 全文檢索：trigram 分詞適合中文子字串查詢（查詢字串需至少 3 個字）
+FTS = """
+CREATE VIRTUAL TABLE books_fts USING fts5(code, title, content='books', content_rowid='id', tokenize='{tokenizer}');
+INSERT INTO books_fts(rowid, code, title) SELECT id, code, title FROM books;
+CREATE VIRTUAL TABLE terms_fts USING fts5(word, head, tokenize='{tokenizer}');
+INSERT INTO terms_fts(rowid, word, head)
+    SELECT terms.id, terms.word, groups.head FROM terms JOIN groups ON groups.id = terms.group_id;
+"""
+
+# 預先定義的查詢：名稱 → (說明, SQL, 參數預設值)
+SAVED_QUERIES = {
+    "books_over_threshold": (
+        "某群組某分類中任一名相筆數超過 min 的書",
+        """
+        SELECT b.code, b.title, t.word, h.total
+        FROM hits h
+        JOIN terms t ON t.id = h.term_id
+        JOIN groups g ON g.id = t.group_id
+        JOIN categories c ON c.id = t.category_id
+        JOIN books b ON b.id = h.book_id
+        WHERE g.head = :group AND c.title = :category AND h.total > :min
+        ORDER BY h.total DESC
+        """,
+        {"group": None, "category": "音譯詞", "min": 10},
+    ),
+    "term_books": (
+        "出現某名相的書及筆數",
+        """
+        SELECT b.code, b.title, g.head AS "group", c.title AS category, h.total
+        FROM terms t
+        JOIN hits h ON h.term_id = t.id
+        JOIN books b ON b.id = h.book_id
+        JOIN groups g ON g.id = t.group_id
+        JOIN categories c ON c.id = t.category_id
+        WHERE t.word = :word
+        ORDER BY h.total DESC
+        """,
+        {"word": None},
+    ),
+    "book_top_terms": (
+        "某本書筆數最多的名相",
+        """
+        SELECT g.head AS "group", c.title AS category, t.word, h.total
+        FROM books b
+        JOIN hits h ON h.book_id = b.id
+        JOIN terms t ON t.id = h.term_id
+        JOIN groups g ON g.id = t.group_id
+        JOIN categories c ON c.id = t.category_id
+        WHERE b.code = :code
+        ORDER BY h.total DESC
+        LIMIT :limit
+        """,
+        {"code": None, "limit": 50},
+    ),
+    "group_juan_profile": (
+        "某本書中某群組（含所有變體）各卷的筆數",
+        """
+        SELECT j.juan, j.page, SUM(j.count) AS count
+        FROM books b
+        JOIN juan_hits j ON j.book_id = b.id
+        JOIN terms t ON t.id = j.term_id
+        JOIN groups g ON g.id = t.group_id
+        WHERE b.code = :code AND g.head = :group
+        GROUP BY j.page
+        ORDER BY j.juan IS NULL, j.juan
+        """,
+        {"code": None, "group": None},
+    ),
+    # trigram 無法比對少於 3 個字的字串（真言、毘盧、吽…會靜默傳回空結果），
+    # 較短的查詢改以 instr() 逐筆比對子字串；資料量小，全表掃描也很快
+    "search_titles": (
+        "查經名：3 個字以上用全文檢索，較短時直接比對子字串",
+        """
+        SELECT b.code, b.title, b.juans
+        FROM books_fts f JOIN books b ON b.id = f.rowid
+        WHERE length(:q) >= 3 AND books_fts MATCH :q
+        UNION ALL
+        SELECT b.code, b.title, b.juans
+        FROM books b
+        WHERE length(:q) < 3 AND instr(b.title, :q) > 0
+        ORDER BY code
+        """,
+        {"q": None},
+    ),
+    "search_terms": (
+        "查名相或群首詞：3 個字以上用全文檢索，較短時直接比對子字串",
+        """
+        SELECT t.word, f.head AS "group", c.title AS category,
+               (SELECT COUNT(*) FROM hits h WHERE h.term_id = t.id) AS books
+        FROM terms_fts f
+        JOIN terms t ON t.id = f.rowid
+        JOIN categories c ON c.id = t.category_id
+        WHERE length(:q) >= 3 AND terms_fts MATCH :q
+        UNION ALL
+        SELECT t.word, g.head AS "group", c.title AS category,
+               (SELECT COUNT(*) FROM hits h WHERE h.term_id = t.id) AS books
+        FROM terms t
+        JOIN groups g ON g.id = t.group_id
+        JOIN categories c ON c.id = t.category_id
+        WHERE length(:q) < 3 AND (instr(t.word, :q) > 0 OR instr(g.head, :q) > 0)
+        """,
+        {"q": None},
+    ),
+}
+
+
+def fts_tokenizer(conn):
+    # trigram 需要 SQLite 3.34 以上，舊版退回 unicode61
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.probe USING fts5(x, tokenize='trigram')")
+        conn.execute("DROP TABLE temp.probe")
+        return "trigram"
+    except sqlite3.OperationalError:
+        return "unicode61"
+
+
+def build_database(path=DB_PATH, json_dir=corpus.WORDS6_JSON_DIR, lexicon_path=corpus.LEXICON_PATH):
+    """
+    將 books.json、words6.json 與 words6_json 的所有計數（含各卷）匯入正規化的 SQLite 資料庫。
+    先寫入暫存檔再改名，服務中的讀取者不會看到寫一半的資料庫。
+    """
+    catalogue = load_catalogue()
+    lexicon = corpus.load_lexicon(lexicon_path)
+
+    with corpus.atomic_path(path) as tmp_path:
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.executescript(SCHEMA)
+
+            collection_ids = {}
+            book_ids = {}
+            for book in catalogue["books"]:
+                if book["collection"] not in collection_ids:
+                    collection_ids[book["collection"]] = len(collection_ids) + 1
+                    conn.execute("INSERT INTO collections VALUES (?, ?)",
+                                 (collection_ids[book["collection"]], book["collection"]))
+                book_ids[book["code"]] = len(book_ids) + 1
+                conn.execute("INSERT INTO books VALUES (?, ?, ?, ?, ?)",
+                             (book_ids[book["code"]], book["code"], book["title"], book["juans"],
+                              collection_ids[book["collection"]]))
+
+            category_ids = {}
+            for json_key, title in corpus.CATEGORIES:
+                category_ids[json_key] = len(category_ids) + 1
+                conn.execute("INSERT INTO categories VALUES (?, ?, ?)", (category_ids[json_key], json_key, title))
+
+            group_ids = {}
+            term_ids = {}
+
+            def group_id(group):
+                if group not in group_ids:
+                    group_ids[group] = len(group_ids) + 1
+                    conn.execute("INSERT INTO groups VALUES (?, ?)", (group_ids[group], group))
+                return group_ids[group]
+
+            def term_id(group, json_key, word):
+                key = (group, json_key, word)
+                if key not in term_ids:
+                    term_ids[key] = len(term_ids) + 1
+                    conn.execute("INSERT INTO terms VALUES (?, ?, ?, ?)",
+                                 (term_ids[key], group_id(group), category_ids[json_key], word))
+                return term_ids[key]
+
+            # 詞表中的所有名相都建立，即使在任何書中都沒有命中
+            for group, info in corpus.sorted_groups(lexicon):
+                term_id(group, corpus.HEAD_KEY, group)
+                for json_key in corpus.CATEGORY_KEYS:
+                    if json_key != corpus.HEAD_KEY:
+                        for word in info.get(json_key, []):
+                            term_id(group, json_key, word)
+
+            for code in corpus.book_codes(json_dir):
+                if code not in book_ids:
+                    logger.warning(f"{code} 不在 books.json 中，略過")
+                    continue
+                b = book_ids[code]
+                hits, juan_hits = [], []
+                for group, json_key, word, entry in corpus.iter_entries(corpus.load_book(code, json_dir)):
+                    total = corpus.entry_total(entry)
+                    if total == 0:
+                        continue
+                    t = term_id(group, json_key, word)
+                    hits.append((b, t, total))
+                    for page, cnt in entry.get("pages", {}).items():
+                        juan_hits.append((b, t, page, corpus.juan_number(page), cnt))
+                conn.executemany("INSERT INTO hits VALUES (?, ?, ?)", hits)
+                conn.executemany("INSERT INTO juan_hits VALUES (?, ?, ?, ?, ?)", juan_hits)
+
+            conn.executescript(INDEXES)
+            conn.executescript(FTS.format(tokenizer=fts_tokenizer(conn)))
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ("schema_version", str(SCHEMA_VERSION)),
+                ("fingerprint", corpus.corpus_fingerprint(json_dir)),
+                ("created", time.strftime("%Y-%m-%dT%H:%M:%S")),
+            ])
+            conn.commit()
+            conn.execute("ANALYZE")
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+    return path
+
+
+def database_is_current(path=DB_PATH, json_dir=corpus.WORDS6_JSON_DIR):
+    """
+    資料庫存在且結構版本相符；有 words6_json 時另外比對指紋。
+    """
+    if not os.path.exists(path):
+        return False
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+    if meta.get("schema_version") != str(SCHEMA_VERSION):
+        return False
+    return corpus.fingerprint_matches(meta.get("fingerprint"), json_dir)
+
+
+def ensure_database(path=DB_PATH):
+    if not database_is_current(path):
+        logger.info(f"建立 SQLite 資料庫: {path}")
+        build_database(path)
+    return path
+
+
+# 唯讀連線只允許以下動作；其他（寫入、ATTACH、PRAGMA 等）一律拒絕
+_ALLOWED_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION}
+if hasattr(sqlite3, "SQLITE_RECURSIVE"):
+    _ALLOWED_ACTIONS.add(sqlite3.SQLITE_RECURSIVE)
+
+
+def _authorizer(action, arg1, arg2, db_name, trigger):
+    if action in _ALLOWED_ACTIONS:
+        return sqlite3.SQLITE_OK
+    # FTS5 虛擬表初始化時會觸發以下內部動作；連線本身為唯讀，不會真的寫入
+    if action == sqlite3.SQLITE_UPDATE and arg1 == "sqlite_master":
+        return sqlite3.SQLITE_OK
+    if action == sqlite3.SQLITE_PRAGMA and arg1 == "data_version":
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+
+def connect_readonly(path=DB_PATH):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    conn.execute("PRAGMA query_only = 1")
+    conn.set_authorizer(_authorizer)
+    return conn
+
+
+def run_query(sql, params=None, path=DB_PATH, max_rows=MAX_ROWS, timeout=QUERY_TIMEOUT):
+    """
+    以唯讀連線執行查詢，超過 timeout 秒即中斷，最多傳回 max_rows 列。
+    SQL 錯誤或被拒絕的動作以 sqlite3.Error 丟出。
+    """
+    conn = connect_readonly(path)
+    deadline = time.perf_counter() + timeout
+    conn.set_progress_handler(lambda: 1 if time.perf_counter() > deadline else 0, 10000)
+    t0 = time.perf_counter()
+    try:
+        cursor = conn.execute(sql, params or {})
+        rows = cursor.fetchmany(max_rows + 1)
+        columns = [d[0] for d in cursor.description or []]
+    finally:
+        conn.close()
+    return {
+        "columns": columns,
+        "rows": [list(row) for row in rows[:max_rows]],
+        "truncated": len(rows) > max_rows,
+        "seconds": time.perf_counter() - t0,
+    }
+
+
+def saved_query_params(name, values):
+    """
+    合併使用者提供的參數與預設值；缺少必要參數時丟出 KeyError，數字參數自動轉型。
+    """
+    _, _, defaults = SAVED_QUERIES[name]
+    params = {}
+    for key, default in defaults.items():
+        value = values.get(key, default)
+        if value is None:
+            raise KeyError(key)
+        if isinstance(default, int) and not isinstance(value, int):
+            value = int(value)
+        params[key] = value
+    return params
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="words6 的 SQLite 查詢資料庫")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help=f"重新建立 {DB_PATH}")
+    sub.add_parser("list", help="列出預先定義的查詢")
+    p_query = sub.add_parser("query", help="執行唯讀 SQL")
+    p_query.add_argument("sql")
+    p_saved = sub.add_parser("saved", help="執行預先定義的查詢，參數以 key=value 指定")
+    p_saved.add_argument("name", choices=sorted(SAVED_QUERIES))
+    p_saved.add_argument("params", nargs="*")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "build":
+        t0 = time.perf_counter()
+        build_database()
+        print(f"已建立 {DB_PATH}（{os.path.getsize(DB_PATH) / 1e6:.1f} MB，{time.perf_counter() - t0:.2f} 秒）")
+        return 0
+    if args.command == "list":
+        for name, (description, _, defaults) in sorted(SAVED_QUERIES.items()):
+            print(f"{name}: {description}  參數: {', '.join(defaults)}")
+        return 0
+
+    ensure_database()
+    try:
+        if args.command == "query":
+            result = run_query(args.sql)
+        else:
+            values = dict(item.split("=", 1) for item in args.params)
+            result = run_query(SAVED_QUERIES[args.name][1], saved_query_params(args.name, values))
+    except KeyError as e:
+        print(f"缺少參數: {e.args[0]}", file=sys.stderr)
+        return 1
+    except (sqlite3.Error, ValueError) as e:
+        print(f"查詢失敗: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+import random
+import unittest
+
+import prefilter
+from prefilter import CharPrefilter, count_literal
+
+
+class CharPrefilterTest(unittest.TestCase):
+    """
+    CharPrefilter.scan() 必須與逐一 str.count 的 count_literal() 完全相同。
+    """
+
+    def assert_same(self, terms, text):
+        pf = CharPrefilter(terms)
+        self.assertEqual(pf.scan(text), count_literal(text, pf.terms), (terms, text))
+
+    def test_empty(self):
+        self.assert_same([], "")
+        self.assert_same([], "真言")
+        self.assert_same([""], "真言")
+        self.assert_same(["真言"], "")
+
+    def test_prefixes_and_overlaps(self):
+        # 同一位置起的多個字詞、字詞自身重疊（str.count 不重疊計數）
+        self.assert_same(["真言", "真言宗", "真"], "真言宗真言真言宗宗")
+        self.assert_same(["吽吽", "吽"], "吽吽吽吽吽")
+        self.assert_same(["阿阿阿", "阿阿"], "阿阿阿阿阿阿阿")
+        self.assert_same(["曼荼羅", "荼羅"], "曼荼羅荼羅曼荼")
+
+    def test_regex_special_characters(self):
+        self.assert_same(["毘那也迦(毗那也迦)", "○○金剛女", "a.b", "[x]"], "毘那也迦(毗那也迦)○○金剛女axb a.b [x]")
+
+    def test_random_against_lexicon(self):
+        lexicon = prefilter.lexicon_terms(prefilter.corpus.load_lexicon())
+        alphabet = sorted(set("".join(lexicon))) + list("之而其於。，")
+        rng = random.Random(20261019)
+        for _ in range(2000):
+            terms = rng.sample(lexicon, rng.randint(1, 80))
+            parts = []
+            for _ in range(rng.randint(0, 40)):
+                if rng.random() < 0.3:
+                    parts.append(rng.choice(terms))
+                else:
+                    parts.append("".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30))))
+            self.assert_same(terms, "".join(parts))
+
+    def test_full_lexicon(self):
+        lexicon = prefilter.lexicon_terms(prefilter.corpus.load_lexicon())
+        rng = random.Random(0)
+        text = "".join(rng.choice(lexicon) + rng.choice("之而其於。，") for _ in range(3000))
+        self.assert_same(lexicon, text)
+
+
+if __name__ == "__main__":
+    unittest.main()